@@ -1,46 +1,27 @@
-from PIL import Image, ImageDraw, ImageFont, ImageTk
-from nltk.tokenize import word_tokenize
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import colorsys
-import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+import io
 import os
-import random
+import queue
 import re
-from typing import Tuple, List, Dict, Any
-from PainGenerator_WebUI.generator import CRUELTY_SQUAD_PALETTE
+from typing import Dict, Any, List, Optional, Tuple
+from PainGenerator_WebUI.generator import (CRUELTY_SQUAD_PALETTE, IMAGE_SIZES, WORDLIST_CHOICES, generate, parse_size,
+                                           render_image, save_result)
 
 
 c_path = os.path.dirname(__file__)
+RENDER_WORKERS = os.cpu_count() or 1
+RESULT_POLL_MS = 50
+PREVIEW_SIZE = 128
+PREVIEW_DELAY_MS = 100
+PREVIEW_REFINE_MS = 500
 
 
-wordlists: Dict[str, List[str]] = {}
-for list_name in ['SPRAWL', 'TempleOS', '1894']:
-    try:
-        with open(os.path.join(c_path, 'resources', f'{list_name}.txt'), 'r', encoding='utf8') as f:
-            wordlists[list_name] = word_tokenize(f.read())
-    except FileNotFoundError:
-        wordlists[list_name] = []
-
 def is_valid_hex_code(s: str) -> bool:
     """Checks if a string is a valid hex code."""
     return bool(re.match(r"^#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})$", s))
 
-def hex_to_rgb(hex_code: str) -> Tuple[int, int, int]:
-    """Converts a hex code to an RGB tuple."""
-    hex_code = hex_code.lstrip('#')
-    if len(hex_code) == 3:
-        hex_code = "".join([c*2 for c in hex_code])
-    return tuple(int(hex_code[i:i+2], 16) for i in (0, 2, 4))
-
-def calculate_text_dimensions(word_length: int, output_width: int) -> Tuple[Tuple[int, int], Tuple[int, int, int, int]]:
-    """Calculates the resize and crop dimensions for the text image, scaled to the output size."""
-    scale_factor = output_width / 128.0
-    resize_y = int(np.interp(word_length, [2, 10], [160, 960]) * scale_factor)
-    crop_y1 = int(np.interp(word_length, [2, 10], [24, 40]) * scale_factor)
-    crop_y2 = int(np.interp(word_length, [2, 10], [152, 168]) * scale_factor)
-    return (output_width, resize_y), (0, crop_y1, output_width, crop_y2)
-
 class ColorPickerWindow(tk.Toplevel):
     def __init__(self, parent, hex_var: tk.StringVar):
         super().__init__(parent)
@@ -106,7 +87,22 @@ class PainGeneratorGUI(tk.Tk):
         self.wordlist_var = tk.StringVar(value='Cyberpunk AF')
         self.size_var = tk.StringVar(value='128x128')
 
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.results: "queue.Queue[Tuple[int, Optional[bytes], Optional[str]]]" = queue.Queue()
+        self.futures: List[Future] = []
+        self.batch_id = 0
+        self.batch_total = 0
+        self.batch_done = 0
+
+        self.preview_executor: Optional[ThreadPoolExecutor] = None
+        self.previews: "queue.Queue[Tuple[int, Any]]" = queue.Queue()
+        self.preview_future: Optional[Future] = None
+        self.preview_id = 0
+        self.preview_timers: List[str] = []
+
         self.create_widgets()
+        for var in (self.word_var, self.hex1_var, self.hex2_var, self.size_var):
+            var.trace_add('write', lambda *_: self.schedule_preview())
         self.toggle_mode()
 
     def setup_style(self):
@@ -141,6 +137,7 @@ class PainGeneratorGUI(tk.Tk):
         style.map('Accent.TButton', background=[('active', '#01b87a')])
         style.configure("Vertical.TScrollbar", background=BUTTON_BG, troughcolor=BG_COLOR, bordercolor=BG_COLOR, arrowcolor=FG_COLOR)
         style.map("Vertical.TScrollbar", background=[('active', SELECT_BG)])
+        style.configure('Horizontal.TProgressbar', background=ACCENT_COLOR, troughcolor=INPUT_BG, bordercolor=BG_COLOR)
 
         
         style.configure('Random.TLabel', background=INPUT_BG, foreground='#FF0000', anchor='center', font=('Courier', 12, 'bold'))
@@ -187,7 +184,7 @@ class PainGeneratorGUI(tk.Tk):
         self.spinbox = ttk.Spinbox(left_frame, from_=1, to=100, textvariable=self.spin_var, width=5)
         self.spinbox.grid(row=7, column=0, columnspan=5, sticky=tk.W, pady=(0,10))
         ttk.Label(left_frame, text="Image Size").grid(row=8, column=0, columnspan=5, sticky=tk.W)
-        self.size_combo = ttk.Combobox(left_frame, textvariable=self.size_var, values=['128x128', '256x256', '512x512', '1024x1024'], state='readonly', width=10)
+        self.size_combo = ttk.Combobox(left_frame, textvariable=self.size_var, values=list(IMAGE_SIZES), state='readonly', width=16)
         self.size_combo.grid(row=9, column=0, columnspan=5, sticky=tk.W, pady=(0,10))
 
         ttk.Label(left_frame, text="Output Folder").grid(row=10, column=0, columnspan=5, sticky=tk.W)
@@ -197,10 +194,14 @@ class PainGeneratorGUI(tk.Tk):
         ttk.Entry(folder_frame, textvariable=self.folder_var).grid(row=0, column=0, sticky=tk.EW)
         ttk.Button(folder_frame, text="Browse", command=self.browse_folder).grid(row=0, column=1, sticky=tk.W, padx=(5,0))
 
-        ttk.Button(left_frame, text="GENERATE", command=self.generate, style="Accent.TButton").grid(row=12, column=0, columnspan=5, pady=10, sticky=tk.EW)
+        self.generate_button = ttk.Button(left_frame, text="GENERATE", command=self.generate, style="Accent.TButton")
+        self.generate_button.grid(row=12, column=0, columnspan=5, pady=10, sticky=tk.EW)
+        self.progress = ttk.Progressbar(left_frame, orient='horizontal', mode='determinate')
+        self.progress.grid(row=13, column=0, columnspan=5, sticky=tk.EW)
 
         
-        self.img = ImageTk.PhotoImage(Image.open(os.path.join(c_path, "resources", "PAIN.png")))
+        # Tk reads PNGs itself, so Pillow isn't loaded until the first image is generated.
+        self.img = tk.PhotoImage(file=os.path.join(c_path, "resources", "PAIN.png"))
         self.image_label = ttk.Label(right_frame, image=self.img, anchor="center")
         self.image_label.grid(row=0, column=0, columnspan=2, sticky="nsew")
 
@@ -208,7 +209,7 @@ class PainGeneratorGUI(tk.Tk):
         wordlist_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5,0))
         wordlist_frame.columnconfigure(0, weight=1) 
         ttk.Label(wordlist_frame, text="WORDLIST:").grid(row=0, column=0, sticky=tk.E, padx=(0,5))
-        self.wordlist_combo = ttk.Combobox(wordlist_frame, textvariable=self.wordlist_var, values=['Cyberpunk AF', 'TempleOS', '1894'], state='readonly', width=15)
+        self.wordlist_combo = ttk.Combobox(wordlist_frame, textvariable=self.wordlist_var, values=list(WORDLIST_CHOICES), state='readonly', width=15)
         self.wordlist_combo.grid(row=0, column=1, sticky=tk.W)
 
         ttk.Button(right_frame, text="EXIT", command=self.destroy, style="Accent.TButton").grid(row=2, column=0, columnspan=2, pady=10, sticky=tk.EW)
@@ -268,77 +269,160 @@ class PainGeneratorGUI(tk.Tk):
             messagebox.showerror("ERROR", "Number is too small or too large. Range = 1 -> 100")
             self.spin_var.set('1')
             return
-        
+
+        if values['-CHECKBOX-']:
+            if not 2 <= len(values['-WORD-']) <= 10:
+                messagebox.showerror("ERROR", "Word is too small or too large. Range = 2 -> 10 letters")
+                return
+            if not (is_valid_hex_code(values['-HEX1-']) and is_valid_hex_code(values['-HEX2-'])):
+                messagebox.showerror("ERROR", "Hex value is incorrect")
+                return
+
+        savepath = values['-FOLDER-']
+        if not os.path.exists(savepath):
+            os.makedirs(savepath, exist_ok=True)
+            self.folder_var.set(savepath)
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix='render')
+        self.batch_id += 1
+        self.batch_total, self.batch_done = times_to_run, 0
+        self.progress.config(maximum=times_to_run, value=0)
+        self.generate_button.config(text="CANCEL", command=self.cancel_batch)
+        self.futures = [self.executor.submit(self.render_one, self.batch_id, values) for _ in range(times_to_run)]
+        self.after(RESULT_POLL_MS, self.poll_results, self.batch_id)
+
+    def render_one(self, batch_id: int, values: Dict[str, Any]):
+        """Renders and saves one image on a worker thread, reporting the PNG or the error to the results queue."""
         try:
-            width, height = map(int, values['-SIZE-'].split('x'))
+            filename, png = generate(values, disk_cache=False)
+            save_result(values['-FOLDER-'], filename, png)
+            self.results.put((batch_id, png, None))
+        except Exception as e:
+            self.results.put((batch_id, None, str(e)))
+
+    def poll_results(self, poll_batch_id: int):
+        # A cancelled or replaced batch stops its own polling; the current batch has its own loop.
+        if poll_batch_id != self.batch_id:
+            return
+        latest_png, error = None, None
+        while True:
+            try:
+                batch_id, png, batch_error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if batch_id != self.batch_id:
+                continue
+            self.batch_done += 1
+            latest_png = png or latest_png
+            error = batch_error or error
+
+        self.progress.config(value=self.batch_done)
+        # Only the newest image of each poll is decoded and shown; the rest are already saved.
+        if latest_png is not None:
+            self.show_preview(latest_png)
+        if error is not None:
+            self.cancel_batch()
+            messagebox.showerror("ERROR", f"Could not generate image: {error}")
+        elif self.batch_done < self.batch_total:
+            self.after(RESULT_POLL_MS, self.poll_results, poll_batch_id)
+        else:
+            self.finish_batch()
+
+    def show_preview(self, png: bytes):
+        from PIL import Image
+
+        img = Image.open(io.BytesIO(png))
+        img.thumbnail((self.image_label.winfo_width(), self.image_label.winfo_height()))
+        self.show_image(img)
+
+    def show_image(self, img: Any):
+        from PIL import ImageTk
+
+        new_img = ImageTk.PhotoImage(img)
+        self.image_label.config(image=new_img)
+        self.image_label.image = new_img
+
+    def cancel_batch(self):
+        for future in self.futures:
+            future.cancel()
+        # Renders already running finish and are saved, but their results are ignored.
+        self.batch_id += 1
+        self.finish_batch()
+
+    def finish_batch(self):
+        self.futures = []
+        self.generate_button.config(text="GENERATE", command=self.generate)
+
+    def schedule_preview(self):
+        """Restarts the preview debounce: a cheap render once input pauses, then the full size once it is idle."""
+        # Bumping the id makes any render still in flight stale, so its result is dropped.
+        self.preview_id += 1
+        for timer in self.preview_timers:
+            self.after_cancel(timer)
+        self.preview_timers = []
+
+        word, hex1, hex2 = self.word_var.get(), self.hex1_var.get(), self.hex2_var.get()
+        if not (self.is_random_var.get() and 2 <= len(word) <= 10 and is_valid_hex_code(hex1) and is_valid_hex_code(hex2)):
+            return
+        try:
+            width, height, pixel = parse_size(self.size_var.get())
         except ValueError:
-            messagebox.showerror("ERROR", "Invalid image size selected.")
             return
+        preview_id = self.preview_id
+        self.preview_timers.append(self.after(PREVIEW_DELAY_MS, lambda: self.request_preview(
+            preview_id, word, hex1, hex2, min(width, PREVIEW_SIZE), min(height, PREVIEW_SIZE))))
+        # A pixel-art texture is the small render blown up, which the cheap preview already shows.
+        if width > PREVIEW_SIZE and not pixel:
+            self.preview_timers.append(self.after(PREVIEW_REFINE_MS, lambda: self.request_preview(
+                preview_id, word, hex1, hex2, width, height)))
+
+    def request_preview(self, preview_id: int, word: str, hex1: str, hex2: str, width: int, height: int):
+        if preview_id != self.preview_id:
+            return
+        if self.preview_executor is None:
+            self.preview_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='preview')
+        if self.preview_future is not None:
+            self.preview_future.cancel()
+        bounds = (self.image_label.winfo_width(), self.image_label.winfo_height())
+        self.preview_future = self.preview_executor.submit(self.render_preview, preview_id, word, hex1, hex2, width, height, bounds)
+        self.after(RESULT_POLL_MS, self.poll_previews)
+
+    def render_preview(self, preview_id: int, word: str, hex1: str, hex2: str, width: int, height: int,
+                       bounds: Tuple[int, int]):
+        """Renders a preview in memory on the preview thread, unless newer input has made it stale."""
+        if preview_id != self.preview_id:
+            return
+        from PIL import Image
 
-        for _ in range(times_to_run):
-            if values['-CHECKBOX-']:
-                word = values['-WORD-']
-                if not 2 <= len(word) <= 10:
-                    messagebox.showerror("ERROR", "Word is too small or too large. Range = 2 -> 10 letters")
-                    break
-                hex1, hex2 = values['-HEX1-'], values['-HEX2-']
-                if not (is_valid_hex_code(hex1) and is_valid_hex_code(hex2)):
-                    messagebox.showerror("ERROR", "Hex value is incorrect")
-                    break
-                color1, color2 = hex_to_rgb(hex1), hex_to_rgb(hex2)
-            else:
-                wordlist_map = {'Cyberpunk AF': 'SPRAWL', 'TempleOS': 'TempleOS', '1894': '1894'}
-                chosen_wordlist = values['-WORDLIST-']
-                wordlist_key = wordlist_map.get(chosen_wordlist)
-                word = random.choice(wordlists.get(wordlist_key, ["DEFAULT"]))
-                hex1, hex2 = random.sample(CRUELTY_SQUAD_PALETTE, 2)
-                color1, color2 = hex_to_rgb(hex1), hex_to_rgb(hex2)
-
-            text_canvas_size = (width * 8, height * 8)
-            txtimg = Image.new('RGBA', text_canvas_size, (255, 255, 255, 0))
-            
-            gradient = np.zeros((height, width, 3), dtype=np.uint8)
-            for i in range(3):
-                gradient[:, :, i] = np.tile(np.linspace(color1[i], color2[i], height, dtype=np.uint8), (width, 1)).T
-            img = Image.fromarray(gradient)
-
-            font_path = os.path.join(c_path, "resources", "Envy Code R.ttf")
-            fontsize = 1
-            font = ImageFont.truetype(font_path, fontsize)
-            while font.getlength(word.upper()) < text_canvas_size[0]:
-                fontsize += 1
-                font = ImageFont.truetype(font_path, fontsize)
-
-            txtdraw = ImageDraw.Draw(txtimg)
-            _, _, total_word_width, _ = txtdraw.textbbox((0, 0), word.upper(), font=font)
-            gap_width = (text_canvas_size[0] - total_word_width) / (len(word) + 1)
-            xpos = gap_width
-            for letter in word.upper():
-                txtdraw.text((xpos, 0), letter, (0, 0, 0), font=font)
-                _, _, letter_width, _ = txtdraw.textbbox((0, 0), letter, font=font)
-                xpos += letter_width + gap_width
-
-            resize_dim, crop_box = calculate_text_dimensions(len(word), width)
-            resized_text = txtimg.resize(resize_dim, Image.LANCZOS)
-            cropped_text = resized_text.crop(crop_box)
-
-            random_file_number = f'{random.randint(1, 999):03}'
-            composite = Image.alpha_composite(img.convert('RGBA'), cropped_text)
-            
-            savepath = values['-FOLDER-']
-            if not os.path.exists(savepath):
-                os.makedirs(savepath, exist_ok=True)
-                self.folder_var.set(savepath)
-
-            save_filename = f'{word.upper()}_{random_file_number}.png'
-            save_full_path = os.path.join(savepath, save_filename)
-            composite.save(save_full_path, quality=95)
-            
-            display_img = Image.open(save_full_path)
-            display_img.thumbnail((self.image_label.winfo_width(), self.image_label.winfo_height()))
-            new_img = ImageTk.PhotoImage(display_img)
-            self.image_label.config(image=new_img)
-            self.image_label.image = new_img
+        img = render_image(word, hex1, hex2, width, height)
+        scale = min(bounds[0] / width, bounds[1] / height)
+        if scale > 1:
+            # Low-resolution previews are blown up to the label's size with hard pixel edges.
+            img = img.resize((int(width * scale), int(height * scale)), Image.NEAREST)
+        else:
+            img.thumbnail(bounds)
+        self.previews.put((preview_id, img))
+
+    def poll_previews(self):
+        latest = None
+        while True:
+            try:
+                preview_id, img = self.previews.get_nowait()
+            except queue.Empty:
+                break
+            if preview_id == self.preview_id:
+                latest = img
+        if latest is not None:
+            self.show_image(latest)
+        if self.preview_future is not None and not self.preview_future.done():
+            self.after(RESULT_POLL_MS, self.poll_previews)
+
+    def destroy(self):
+        for executor in (self.executor, self.preview_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        super().destroy()
 
 if __name__ == "__main__":
     app = PainGeneratorGUI()
@@ -0,0 +1,153 @@
+"""Headless bulk texture generation across all CPU cores.
+
+    python PainGeneratorCLI.py --count 20000 --wordlist TempleOS --size 512 --seed 7 --outdir pack
+
+Image N of a run is fully determined by the seed and N, and is saved as NNNNNN_WORD_<key>.png.
+Re-running the same command skips the images that already exist, so an interrupted run resumes
+where it stopped, and a larger --count extends a finished one.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Set, Tuple
+from PainGenerator_WebUI import generator
+
+MANIFEST_NAME = 'pain_batch.json'
+PROGRESS_INTERVAL = 2.0
+CHUNK_SIZE = 16
+
+_settings: Dict[str, Any] = {}
+_words: Optional[generator.WordIndex] = None
+
+
+def _init_worker(settings: Dict[str, Any]):
+    global _settings, _words
+    _settings = settings
+    if settings['words']:
+        _words = generator.WordIndex(None, settings['words'])
+    generator.warm_up()
+
+def image_values(index: int) -> Dict[str, Any]:
+    """Returns the generator values for image index of the run described by the worker's settings."""
+    seed = f"{_settings['seed']}:{index}"
+    values = {'-SIZE-': _settings['size'], '-SEED-': seed}
+    if _words is not None:
+        values.update({'-CHECKBOX-': True, '-WORD-': _words.choice(random.Random(f'{seed}:word'))})
+    else:
+        values.update({'-CHECKBOX-': False, '-WORDLIST-': _settings['wordlist']})
+    return values
+
+def render_chunk(indices: List[int]) -> Tuple[int, int]:
+    """Renders a chunk of images in a worker process and writes each atomically, returning (images, bytes).
+
+    The chunk goes through the batch engine in one call. Output is written straight to its
+    files rather than through the render cache, which would otherwise hold a second copy of
+    every image.
+    """
+    params = [generator.resolve_values(image_values(index)) for index in indices]
+    _, _, _, width, height, pixel = params[0]
+    total_bytes = 0
+    jobs = [(word, hex1, hex2) for word, hex1, hex2, _, _, _ in params]
+    for index, (word, hex1, hex2, _, _, _), image in zip(indices, params, generator.render_batch(jobs, width, height, pixel)):
+        key = generator.render_key(word, hex1, hex2, width, height, pixel)
+        path = os.path.join(_settings['outdir'], f'{index:06d}_{word.upper()}_{key[:8]}.png')
+        temp_path = os.path.join(_settings['outdir'], f'.{index}.{os.getpid()}.tmp')
+        image.save(temp_path, format='PNG')
+        os.replace(temp_path, path)
+        total_bytes += os.path.getsize(path)
+    return len(indices), total_bytes
+
+def existing_indices(outdir: str) -> Set[int]:
+    """Returns the indices already written to outdir and removes temp files left by an interrupted run."""
+    done = set()
+    for name in os.listdir(outdir):
+        if re.fullmatch(r'\.\d+\.\d+\.tmp', name):
+            os.remove(os.path.join(outdir, name))
+        match = re.match(r'(\d+)_.*\.png$', name)
+        if match:
+            done.add(int(match.group(1)))
+    return done
+
+def check_manifest(outdir: str, settings: Dict[str, Any]):
+    """Records the run's settings in outdir, refusing to mix images from runs with different settings."""
+    manifest = {key: settings[key] for key in ('seed', 'size', 'wordlist', 'words')}
+    manifest['renderer_version'] = generator.RENDERER_VERSION
+    path = os.path.join(outdir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf8') as f:
+            previous = json.load(f)
+        if previous != manifest:
+            sys.exit(f"{outdir} holds a run with different settings ({previous}); use another --outdir.")
+        return
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(manifest, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, required=True, help="number of images in the run")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--wordlist', default='Cyberpunk AF', choices=list(generator.WORDLIST_CHOICES))
+    source.add_argument('--words', help="text file of words to draw from instead of a built-in wordlist")
+    parser.add_argument('--size', type=int, default=128, choices=generator.RENDER_SIZES)
+    parser.add_argument('--pixel', action='store_true', help="draw the 128x128 layout and upscale it as pixel art")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--outdir', default=os.path.join(generator.c_path, 'results', 'batch'))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if args.count < 1:
+        parser.error("--count must be at least 1")
+    if args.words and not os.path.isfile(args.words):
+        parser.error(f"word file {args.words} does not exist")
+    if args.words and not len(generator.WordIndex(None, args.words)):
+        parser.error(f"word file {args.words} has no words of 2 to 10 letters")
+
+    size = f'{args.size}x{args.size}' + (generator.PIXEL_ART_SUFFIX if args.pixel else '')
+    try:
+        generator.parse_size(size)
+    except ValueError as e:
+        parser.error(str(e))
+
+    settings = {
+        'seed': args.seed, 'size': size,
+        'wordlist': None if args.words else args.wordlist,
+        'words': os.path.abspath(args.words) if args.words else None,
+        'outdir': os.path.abspath(args.outdir),
+    }
+    os.makedirs(settings['outdir'], exist_ok=True)
+    check_manifest(settings['outdir'], settings)
+    done = existing_indices(settings['outdir'])
+    todo = [index for index in range(args.count) if index not in done]
+    print(f"{args.count - len(todo)} of {args.count} images already in {settings['outdir']}, rendering {len(todo)} "
+          f"on {args.workers} workers.")
+
+    rendered = 0
+    total_bytes = 0
+    start = last_report = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(settings,)) as executor:
+        try:
+            chunks = [todo[i:i + CHUNK_SIZE] for i in range(0, len(todo), CHUNK_SIZE)]
+            for images, nbytes in executor.map(render_chunk, chunks):
+                rendered += images
+                total_bytes += nbytes
+                now = time.time()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    print(f"{rendered}/{len(todo)} images, {rendered / (now - start):.1f} images/s")
+                    last_report = now
+        except KeyboardInterrupt:
+            executor.shutdown(wait=True, cancel_futures=True)
+            print(f"Interrupted after {rendered} images; run the same command again to resume.")
+            sys.exit(130)
+
+    elapsed = max(time.time() - start, 1e-9)
+    print(f"Rendered {rendered} images ({total_bytes / 1024 / 1024:.1f} MB) in {elapsed:.1f}s, "
+          f"{rendered / elapsed:.1f} images/s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,17 @@
 import discord
 from discord import app_commands
-from discord.ext import tasks
+import io
 import os
 import sys
 import random
 import json
+import sqlite3
+import threading
 import time
-from typing import Literal, Optional
-from PIL import Image, ImageDraw, ImageFont
+from typing import Literal, Optional, Tuple, List, Dict, Set, Any, Callable, Awaitable
+from concurrent.futures import ProcessPoolExecutor
 import asyncio
+import heapq
 
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -17,6 +20,17 @@ from PainGenerator_WebUI import generator
 
 DISCORD_BOT_TOKEN = os.environ.get('DISCORD_BOT_TOKEN', 'YOUR_BOT_TOKEN_HERE')
 CONFIG_FILE = 'server_configs.json'
+CONFIG_DB = 'server_configs.db'
+RENDER_WORKERS = int(os.environ.get('PAIN_RENDER_WORKERS', os.cpu_count() or 1))
+MAX_ATTACHMENTS = 10
+UPLOAD_COALESCE_SECONDS = float(os.environ.get('PAIN_UPLOAD_COALESCE', 1.0))
+AUTO_POST_RETRY_SECONDS = 300
+AUTO_POST_CONCURRENCY = int(os.environ.get('PAIN_AUTO_POST_CONCURRENCY', 20))
+BUSY_MESSAGE = "The bot is busy rendering other images, please try again in a moment."
+RENDER_QUEUE_DEPTH = int(os.environ.get('PAIN_RENDER_QUEUE_DEPTH', max(RENDER_WORKERS * 4, MAX_ATTACHMENTS)))
+# The 'pixel' sizes draw the 128x128 layout and scale it up with hard pixel edges.
+ImageSize = Literal[generator.IMAGE_SIZES]
+WordlistName = Literal[tuple(generator.WORDLIST_CHOICES)]
 
 
 intents = discord.Intents.default()
@@ -25,19 +39,161 @@ bot = discord.Client(intents=intents)
 tree = app_commands.CommandTree(bot)
 
 
-server_configs = {}
+class ConfigStore:
+    """Guild configs persisted in SQLite, one row per guild, writing only the entries that changed."""
+
+    COLUMNS = ('target_channel_id', 'frequency_hours', 'default_wordlist', 'last_posted_timestamp',
+               'hex1', 'hex2', 'random_colors')
+
+    def __init__(self, path: str, json_path: Optional[str] = None):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.dirty: Set[str] = set()
+        self.posted: Set[str] = set()
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] == 0:
+            self._create(json_path)
+
+    def _create(self, json_path: Optional[str]):
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS guild_configs (guild_id TEXT PRIMARY KEY, target_channel_id INTEGER, '
+                'frequency_hours INTEGER, default_wordlist TEXT, last_posted_timestamp REAL, '
+                'hex1 TEXT, hex2 TEXT, random_colors INTEGER)'
+            )
+            if json_path and os.path.exists(json_path):
+                with open(json_path, 'r') as f:
+                    configs = {str(k): v for k, v in json.load(f).items()}
+                self._write(configs, configs)
+                print(f'Migrated configs for {len(configs)} servers from {json_path}.')
+            self.conn.execute('PRAGMA user_version = 1')
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        rows = self.conn.execute(f'SELECT guild_id, {", ".join(self.COLUMNS)} FROM guild_configs')
+        configs = {}
+        for guild_id_str, *fields in rows:
+            config = dict(zip(self.COLUMNS, fields))
+            config['random_colors'] = bool(config['random_colors'])
+            configs[guild_id_str] = config
+        return configs
+
+    def mark_dirty(self, guild_id_str: str):
+        """Marks a guild's whole config for writing on the next flush."""
+        self.dirty.add(guild_id_str)
+
+    def mark_posted(self, guild_id_str: str):
+        """Marks a guild's last_posted_timestamp for writing on the next flush."""
+        self.posted.add(guild_id_str)
+
+    def _write(self, configs: Dict[str, Dict[str, Any]], guild_ids):
+        defaults = {'frequency_hours': 3, 'default_wordlist': 'Cyberpunk AF', 'last_posted_timestamp': 0,
+                    'random_colors': True}
+        self.conn.executemany(
+            f'INSERT OR REPLACE INTO guild_configs (guild_id, {", ".join(self.COLUMNS)}) '
+            f'VALUES (?{", ?" * len(self.COLUMNS)})',
+            [(guild_id_str, *(configs[guild_id_str].get(c, defaults.get(c)) for c in self.COLUMNS))
+             for guild_id_str in guild_ids if guild_id_str in configs]
+        )
+
+    def flush(self, configs: Dict[str, Dict[str, Any]]):
+        """Writes the dirty guilds and batched post timestamps in a single transaction."""
+        if not self.dirty and not self.posted:
+            return
+        with self.conn:
+            self._write(configs, self.dirty)
+            self.conn.executemany(
+                'UPDATE guild_configs SET last_posted_timestamp = ? WHERE guild_id = ?',
+                [(configs[guild_id_str]['last_posted_timestamp'], guild_id_str)
+                 for guild_id_str in self.posted - self.dirty if guild_id_str in configs]
+            )
+        self.dirty.clear()
+        self.posted.clear()
+
+
+server_configs: Dict[str, Dict[str, Any]] = {}
+config_store: Optional[ConfigStore] = None
 
 def load_configs():
-    global server_configs
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            server_configs = {str(k): v for k, v in json.load(f).items()}
-    else:
-        server_configs = {}
+    global server_configs, config_store
+    if config_store is None:
+        config_store = ConfigStore(CONFIG_DB, CONFIG_FILE)
+    server_configs = config_store.load()
 
 def save_configs():
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(server_configs, f, indent=4)
+    if config_store is not None:
+        config_store.flush(server_configs)
+
+class RenderBusyError(Exception):
+    """Raised when more renders are queued than RENDER_QUEUE_DEPTH allows."""
+
+
+render_pool: Optional[ProcessPoolExecutor] = None
+render_pool_lock = threading.Lock()
+pending_renders = 0
+
+def get_render_pool() -> ProcessPoolExecutor:
+    global render_pool
+    # The warm pool's refill thread and the event loop can both ask for the first time.
+    with render_pool_lock:
+        if render_pool is None:
+            # Each worker loads the wordlists and the fonts and glyphs for every size before its first render.
+            render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, initializer=generator.preload,
+                                              initargs=(generator.RENDER_SIZES,))
+        return render_pool
+
+# Random images are pre-rendered in the worker pool whenever no command is waiting on it.
+warm_pool = generator.WarmPool(
+    generator.WARM_POOL_DEPTH, generator.WARM_POOL_BUDGET,
+    render=lambda values: get_render_pool().submit(generator.generate, values).result(),
+    is_idle=lambda: pending_renders == 0
+)
+
+async def render(values: Dict[str, Any]) -> Tuple[str, bytes]:
+    """Renders an image in the worker pool without blocking the event loop, using the warm pool for random images."""
+    global pending_renders
+    image = warm_pool.take(values)
+    if image is not None:
+        return image
+    if pending_renders >= RENDER_QUEUE_DEPTH:
+        raise RenderBusyError(BUSY_MESSAGE)
+    pending_renders += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_render_pool(), generator.generate, values)
+    finally:
+        pending_renders -= 1
+
+async def render_and_send(jobs: List[Dict[str, Any]], send: Callable[..., Awaitable[Any]]) -> None:
+    """Renders the jobs concurrently and sends images as they finish, up to MAX_ATTACHMENTS per message.
+
+    Once an image is ready, the rest get up to UPLOAD_COALESCE_SECONDS (about one upload) to join
+    it in the same message, and anything finishing after that is rendered while the message uploads.
+    Renders that finish close together therefore share a message.
+    """
+    if pending_renders + len(jobs) > RENDER_QUEUE_DEPTH:
+        await send(BUSY_MESSAGE)
+        return
+    loop = asyncio.get_running_loop()
+    pending = {asyncio.ensure_future(render(values)) for values in jobs}
+    errors = []
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        deadline = loop.time() + UPLOAD_COALESCE_SECONDS
+        while pending and len(done) < MAX_ATTACHMENTS and loop.time() < deadline:
+            finished, pending = await asyncio.wait(pending, timeout=deadline - loop.time(),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+            done |= finished
+        files = []
+        for task in done:
+            try:
+                filename, png = task.result()
+                files.append(discord.File(io.BytesIO(png), filename=filename))
+            except Exception as e:
+                errors.append(e)
+        for i in range(0, len(files), MAX_ATTACHMENTS):
+            await send(files=files[i:i + MAX_ATTACHMENTS])
+    if errors:
+        reason = next((e for e in errors if isinstance(e, RenderBusyError)), errors[0])
+        await send(f"Failed to generate {len(errors)} of {len(jobs)} images: {reason}")
 
 def get_guild_config(guild_id: int):
     guild_id_str = str(guild_id)
@@ -61,7 +217,8 @@ async def on_ready():
     print('Syncing command tree...')
     await tree.sync()
     print('Command tree synced.')
-    auto_post_task.start()
+    scheduler.schedule_all()
+    scheduler.start()
 
 
 @tree.command(name='setup', description='Configure the bot for this server (Admins only).')
@@ -75,7 +232,7 @@ async def on_ready():
 )
 @app_commands.checks.has_permissions(administrator=True)
 async def setup(interaction: discord.Interaction, channel: discord.TextChannel, frequency: app_commands.Range[int, 1, 168],
-                wordlist: Literal['Cyberpunk AF', 'TempleOS', '1894'], random_colors: bool = True,
+                wordlist: WordlistName, random_colors: bool = True,
                 hex1: Optional[str] = None, hex2: Optional[str] = None):
     if not interaction.guild:
         await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
@@ -97,7 +254,9 @@ async def setup(interaction: discord.Interaction, channel: discord.TextChannel,
         'hex1': hex1 if not random_colors else None,
         'hex2': hex2 if not random_colors else None
     })
+    config_store.mark_dirty(str(interaction.guild.id))
     save_configs()
+    scheduler.schedule(str(interaction.guild.id))
     color_status = "Random from Palette" if random_colors else f"{hex1} & {hex2}"
     await interaction.response.send_message(
         f"Configuration updated!\n"
@@ -111,8 +270,8 @@ async def setup(interaction: discord.Interaction, channel: discord.TextChannel,
 @app_commands.describe(word='The word to display (2-10 letters). Omit for a random word.',
                        hex1='The first hex color (e.g., #FF0000). Omit for random.',
                        hex2='The second hex color (e.g., #0000FF). Omit for random.',
-                       size='The size of the image.')
-async def generate_cmd(interaction: discord.Interaction, size: Literal['128x128', '256x256', '512x512', '1024x1024'] = '256x256',
+                       size='The size of the image; "pixel" sizes are upscaled pixel art.')
+async def generate_cmd(interaction: discord.Interaction, size: ImageSize = '256x256',
                        word: Optional[str] = None, hex1: Optional[str] = None, hex2: Optional[str] = None):
     await interaction.response.defer()
     try:
@@ -122,9 +281,10 @@ async def generate_cmd(interaction: discord.Interaction, size: Literal['128x128'
             '-WORDLIST-': config['default_wordlist'], '-WORD-': word,
             '-HEX1-': hex1, '-HEX2-': hex2,
         }
-        image_path = generator.generate_image(values)
-        await interaction.followup.send(file=discord.File(image_path))
-        os.remove(image_path)
+        filename, png = await render(values)
+        await interaction.followup.send(file=discord.File(io.BytesIO(png), filename=filename))
+    except RenderBusyError as e:
+        await interaction.followup.send(str(e))
     except ValueError as e:
         await interaction.followup.send(f"Error: {e}")
     except Exception as e:
@@ -135,28 +295,23 @@ async def generate_cmd(interaction: discord.Interaction, size: Literal['128x128'
 @app_commands.describe(
     quantity='The number of images to generate (1-10).',
     wordlist='The wordlist to use for random words.',
-    size='The size of the generated images.'
+    size='The size of the generated images; "pixel" sizes are upscaled pixel art.'
 )
 async def randomgen(
     interaction: discord.Interaction,
     quantity: app_commands.Range[int, 1, 10],
-    wordlist: Literal['Cyberpunk AF', 'TempleOS', '1894'],
-    size: Literal['128x128', '256x256', '512x512', '1024x1024'] = '256x256'
+    wordlist: WordlistName,
+    size: ImageSize = '256x256'
 ):
     await interaction.response.defer()
     await interaction.followup.send(f"Generating {quantity} random images from the `{wordlist}` wordlist at {size}...")
-    for i in range(quantity):
-        try:
-            values = {'-CHECKBOX-': False, '-WORDLIST-': wordlist, '-SIZE-': size}
-            image_path = generator.generate_image(values)
-            await interaction.channel.send(f"Image {i+1}/{quantity}", file=discord.File(image_path))
-            os.remove(image_path)
-        except Exception as e:
-            await interaction.channel.send(f"Failed to generate image {i+1}: {e}")
-        await asyncio.sleep(1)
+    jobs = [{'-CHECKBOX-': False, '-WORDLIST-': wordlist, '-SIZE-': size} for _ in range(quantity)]
+    await render_and_send(jobs, interaction.channel.send)
 
 @tree.command(name='colorpalette', description='Displays the Cruelty Squad color palette.')
 async def colorpalette(interaction: discord.Interaction):
+    from PIL import Image, ImageDraw, ImageFont
+
     await interaction.response.defer()
     try:
         cols = 12
@@ -185,44 +340,134 @@ async def colorpalette(interaction: discord.Interaction):
             text_y = y + swatch_size + text_h / 2
             draw.text((text_x, text_y), color_hex, fill='#FFFFFF', font=font, anchor='mm')
 
-        palette_path = os.path.join(generator.c_path, 'results', 'palette.png')
-        os.makedirs(os.path.dirname(palette_path), exist_ok=True)
-        img.save(palette_path)
-        await interaction.followup.send(file=discord.File(palette_path), ephemeral=True)
-        os.remove(palette_path)
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+        buffer.seek(0)
+        await interaction.followup.send(file=discord.File(buffer, filename='palette.png'), ephemeral=True)
     except Exception as e:
         await interaction.followup.send(f"An error occurred while generating the palette: {e}")
 
 
-@tasks.loop(minutes=5)
-async def auto_post_task():
-    current_time = time.time()
-    for guild_id_str, config in server_configs.items():
-        if not all(k in config for k in ['target_channel_id', 'frequency_hours', 'last_posted_timestamp']):
-            continue
-        
-        frequency_seconds = config['frequency_hours'] * 3600
-        if (current_time - config['last_posted_timestamp']) > frequency_seconds:
-            channel = bot.get_channel(config['target_channel_id'])
-            if channel:
+class AutoPostScheduler:
+    """Keeps each guild's next auto-post time in a min-heap and sleeps until the earliest one is due."""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, guild_id_str: str, due: Optional[float] = None):
+        """(Re)schedules a guild, by default for one posting interval after its last post."""
+        config = server_configs.get(guild_id_str)
+        if not config or not config.get('target_channel_id'):
+            self._due.pop(guild_id_str, None)
+            return
+        if due is None:
+            due = config.get('last_posted_timestamp', 0) + config['frequency_hours'] * 3600
+        self._due[guild_id_str] = due
+        heapq.heappush(self._heap, (due, guild_id_str))
+        self._wakeup.set()
+
+    def schedule_all(self):
+        """Schedules every configured guild, posting right away for any whose interval passed while offline."""
+        self._heap.clear()
+        self._due.clear()
+        for guild_id_str in server_configs:
+            self.schedule(guild_id_str)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def _pop_due(self, now: float) -> List[str]:
+        due_guilds = []
+        while self._heap and self._heap[0][0] <= now:
+            due, guild_id_str = heapq.heappop(self._heap)
+            # Entries replaced by a later schedule() call are skipped here.
+            if self._due.get(guild_id_str) == due:
+                del self._due[guild_id_str]
+                due_guilds.append(guild_id_str)
+        return due_guilds
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due_guilds = self._pop_due(time.time())
+            if due_guilds:
                 try:
-                    print(f"Posting automatic image to '{channel.guild.name}'...")
-                    values = {
-                        '-CHECKBOX-': not config.get('random_colors', True),
-                        '-WORDLIST-': config['default_wordlist'], '-SIZE-': '256x256',
-                        '-HEX1-': config.get('hex1'), '-HEX2-': config.get('hex2'),
-                    }
-                    image_path = generator.generate_image(values)
-                    await channel.send(file=discord.File(image_path))
-                    os.remove(image_path)
-                    config['last_posted_timestamp'] = current_time
+                    await post_due_guilds(due_guilds)
                 except Exception as e:
-                    print(f"Failed to post to '{channel.guild.name}': {e}")
-    save_configs()
+                    print(f"Automatic posting failed: {e}")
+
+
+scheduler = AutoPostScheduler()
 
-@auto_post_task.before_loop
-async def before_auto_post_task():
-    await bot.wait_until_ready()
+def auto_post_values(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the generator values for a guild's automatic post."""
+    random_colors = config.get('random_colors', True)
+    return {
+        '-CHECKBOX-': not random_colors,
+        '-WORDLIST-': config['default_wordlist'], '-SIZE-': '256x256',
+        '-HEX1-': None if random_colors else config.get('hex1'),
+        '-HEX2-': None if random_colors else config.get('hex2'),
+    }
+
+async def post_due_guilds(guild_ids: List[str]):
+    """Posts an automatic image to each due guild and schedules its next post.
+
+    Guilds with the same effective settings share one render per tick, and the sends run
+    concurrently, at most AUTO_POST_CONCURRENCY at a time.
+    """
+    current_time = time.time()
+    groups: Dict[Tuple, List[Tuple[str, Any]]] = {}
+    for guild_id_str in guild_ids:
+        config = server_configs.get(guild_id_str)
+        if not config:
+            continue
+        channel = bot.get_channel(config['target_channel_id'])
+        if not channel:
+            scheduler.schedule(guild_id_str, current_time + AUTO_POST_RETRY_SECONDS)
+            continue
+        values = auto_post_values(config)
+        groups.setdefault(tuple(sorted(values.items())), []).append((guild_id_str, channel))
+
+    send_slots = asyncio.Semaphore(AUTO_POST_CONCURRENCY)
+    # Leave room in the render queue for interactive commands.
+    render_slots = asyncio.Semaphore(RENDER_WORKERS)
+
+    async def post(guild_id_str: str, channel: Any, filename: str, png: bytes):
+        async with send_slots:
+            try:
+                print(f"Posting automatic image to '{channel.guild.name}'...")
+                await channel.send(file=discord.File(io.BytesIO(png), filename=filename))
+                server_configs[guild_id_str]['last_posted_timestamp'] = current_time
+                config_store.mark_posted(guild_id_str)
+                scheduler.schedule(guild_id_str)
+            except Exception as e:
+                print(f"Failed to post to '{channel.guild.name}': {e}")
+                scheduler.schedule(guild_id_str, current_time + AUTO_POST_RETRY_SECONDS)
+
+    async def post_group(key: Tuple, members: List[Tuple[str, Any]]):
+        try:
+            async with render_slots:
+                filename, png = await render(dict(key))
+        except Exception as e:
+            print(f"Failed to render automatic image for {len(members)} server(s): {e}")
+            for guild_id_str, _ in members:
+                scheduler.schedule(guild_id_str, current_time + AUTO_POST_RETRY_SECONDS)
+            return
+        await asyncio.gather(*(post(guild_id_str, channel, filename, png) for guild_id_str, channel in members))
+
+    await asyncio.gather(*(post_group(key, members) for key, members in groups.items()))
+    save_configs()
 
 
 if __name__ == "__main__":
@@ -1,14 +1,58 @@
-from PIL import Image, ImageDraw, ImageFont
-from nltk.tokenize import word_tokenize
-import colorsys
-import numpy as np
+from __future__ import annotations
+from collections import OrderedDict, deque
+from functools import lru_cache
+import hashlib
+import importlib
+import io
+import math
+import mmap
 import os
 import random
 import re
-from typing import Tuple, List, Dict, Any
+import sqlite3
+import struct
+import threading
+import time
+from typing import Tuple, List, Dict, Any, Optional, Callable, Iterator, Sequence
 
 
+class _LazyModule:
+    """Stands in for a module and imports it on first attribute access, keeping this module cheap to import."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str) -> Any:
+        if self._module is None:
+            # The import system's own locking makes concurrent first accesses safe.
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+Image = _LazyModule('PIL.Image')
+ImageDraw = _LazyModule('PIL.ImageDraw')
+ImageFont = _LazyModule('PIL.ImageFont')
+np = _LazyModule('numpy')
+
 c_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FONT_PATH = os.path.join(c_path, "resources", "Envy Code R.ttf")
+GLYPH_ATLAS_BUDGET = int(os.environ.get('PAIN_GLYPH_ATLAS_BYTES', 64 * 1024 * 1024))
+GRADIENT_CACHE_BUDGET = 32 * 1024 * 1024
+RENDER_CACHE_BUDGET = 64 * 1024 * 1024
+BATCH_BUDGET = 32 * 1024 * 1024
+PIXEL_ART_BASE = 128
+PIXEL_ART_SUFFIX = ' pixel'
+RESULTS_FOLDER = os.path.join(c_path, 'results')
+RENDER_CACHE_FOLDER = os.environ.get('PAIN_RENDER_CACHE', os.path.join(c_path, 'cache'))
+RENDER_CACHE_DISK_BUDGET = int(os.environ.get('PAIN_RENDER_CACHE_BYTES', 1024 * 1024 * 1024))
+RENDER_CACHE_DISK_FILES = int(os.environ.get('PAIN_RENDER_CACHE_FILES', 20000))
+RENDERER_VERSION = 1
+WARM_POOL_DEPTH = int(os.environ.get('PAIN_WARM_POOL_DEPTH', 4))
+WARM_POOL_BUDGET = int(os.environ.get('PAIN_WARM_POOL_BYTES', 32 * 1024 * 1024))
+WARM_POOL_IDLE_POLL = 0.5
+RESULTS_BUDGET = int(os.environ.get('PAIN_RESULTS_BYTES', 512 * 1024 * 1024))
+RESULTS_MAX_FILES = int(os.environ.get('PAIN_RESULTS_FILES', 5000))
 
 
 CRUELTY_SQUAD_PALETTE = [
@@ -35,13 +79,94 @@ CRUELTY_SQUAD_PALETTE = [
 ]
 
 
-wordlists: Dict[str, List[str]] = {}
-for list_name in ['SPRAWL', 'TempleOS', '1894']:
-    try:
-        with open(os.path.join(c_path, 'resources', f'{list_name}.txt'), 'r', encoding='utf8') as f:
-            wordlists[list_name] = word_tokenize(f.read())
-    except FileNotFoundError:
-        wordlists[list_name] = []
+WORDLIST_NAMES = ('SPRAWL', 'TempleOS', '1894')
+# The wordlist names shown by the front ends, and the list each one draws from.
+WORDLIST_CHOICES = {'Cyberpunk AF': 'SPRAWL', 'TempleOS': 'TempleOS', '1894': '1894'}
+# The square output sizes the front ends offer, and their size strings, pixel-art ones included.
+RENDER_SIZES = (128, 256, 512, 1024)
+IMAGE_SIZES = (tuple(f'{size}x{size}' for size in RENDER_SIZES)
+               + tuple(f'{size}x{size}{PIXEL_ART_SUFFIX}' for size in RENDER_SIZES if size > PIXEL_ART_BASE))
+WORD_LENGTHS = range(2, 11)
+WORDLIST_MAGIC = b'PWL1'
+
+def compile_wordlist(text: str) -> bytes:
+    """Compiles whitespace-separated words into an index of fixed-width records bucketed by length.
+
+    The header is the magic followed by the word count for each length from 2 to 10; the buckets
+    follow in the same order, each holding its words back to back as ASCII letters. Words of any
+    other length or with other characters are dropped.
+    """
+    buckets: Dict[int, List[bytes]] = {length: [] for length in WORD_LENGTHS}
+    for word in text.split():
+        if word.isascii() and word.isalpha() and len(word) in buckets:
+            buckets[len(word)].append(word.encode('ascii'))
+    header = WORDLIST_MAGIC + struct.pack(f'<{len(WORD_LENGTHS)}I', *(len(words) for words in buckets.values()))
+    return header + b''.join(b''.join(words) for words in buckets.values())
+
+class WordIndex:
+    """A compiled wordlist, memory-mapped on first use, that picks a word uniformly in O(1).
+
+    Falls back to compiling the source text in memory when there is no index file or it has not been built.
+    """
+
+    def __init__(self, index_path: Optional[str], source_path: str):
+        self.index_path = index_path
+        self.source_path = source_path
+        self._data: Optional[Any] = None
+        self._buckets: List[Tuple[int, int, int]] = []
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._data is not None:
+                return
+            data = None
+            if self.index_path is not None:
+                try:
+                    with open(self.index_path, 'rb') as f:
+                        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (FileNotFoundError, ValueError):
+                    pass
+            if data is None:
+                try:
+                    with open(self.source_path, 'r', encoding='utf8') as f:
+                        data = compile_wordlist(f.read())
+                except FileNotFoundError:
+                    data = compile_wordlist('')
+            if data[:len(WORDLIST_MAGIC)] != WORDLIST_MAGIC:
+                raise ValueError(f"{self.index_path} is not a compiled wordlist, rebuild it with build_wordlists.py.")
+            counts = struct.unpack_from(f'<{len(WORD_LENGTHS)}I', data, len(WORDLIST_MAGIC))
+            offset = len(WORDLIST_MAGIC) + 4 * len(WORD_LENGTHS)
+            for length, count in zip(WORD_LENGTHS, counts):
+                if count:
+                    self._buckets.append((length, count, offset))
+                offset += length * count
+            self._total = sum(counts)
+            self._data = data
+
+    def __len__(self) -> int:
+        self._load()
+        return self._total
+
+    def choice(self, rng: Any = random) -> str:
+        """Returns a random word, drawing from rng (a random.Random or the random module)."""
+        self._load()
+        if not self._total:
+            raise IndexError("Cannot choose from an empty wordlist.")
+        index = rng.randrange(self._total)
+        for length, count, offset in self._buckets:
+            if index < count:
+                break
+            index -= count
+        start = offset + index * length
+        return self._data[start:start + length].decode('ascii')
+
+wordlists: Dict[str, WordIndex] = {
+    list_name: WordIndex(os.path.join(c_path, 'resources', f'{list_name}.idx'),
+                         os.path.join(c_path, 'resources', f'{list_name}.txt'))
+    for list_name in WORDLIST_NAMES
+}
 
 def is_valid_hex_code(s: str) -> bool:
     """Checks if a string is a valid hex code."""
@@ -62,80 +187,626 @@ def calculate_text_dimensions(word_length: int, output_width: int) -> Tuple[Tupl
     crop_y2 = int(np.interp(word_length, [2, 10], [152, 168]) * scale_factor)
     return (output_width, resize_y), (0, crop_y1, output_width, crop_y2)
 
-def generate_image(values: Dict[str, Any]) -> str:
-    """Generates a single image based on the provided values and returns the save path."""
-    is_user_generated = values.get('-CHECKBOX-', False)
+@lru_cache(maxsize=64)
+def load_font(fontsize: int) -> ImageFont.FreeTypeFont:
+    """Loads the texture font at the given size, keeping recently used sizes in memory."""
+    return ImageFont.truetype(FONT_PATH, fontsize)
 
-    
+@lru_cache(maxsize=1024)
+def fit_font_size(text: str, canvas_width: int) -> int:
+    """Returns the smallest font size at which the text is at least as long as the canvas is wide.
+
+    Glyph advances scale linearly with the font size, so the size is estimated directly and then
+    stepped to the exact boundary, giving the same result as counting up from 1.
+    """
+    def fits(fontsize: int) -> bool:
+        return load_font(fontsize).getlength(text) >= canvas_width
+
+    fontsize = 100
+    for _ in range(2):
+        length = load_font(fontsize).getlength(text)
+        if length <= 0:
+            break
+        fontsize = max(1, math.ceil(canvas_width * fontsize / length))
+    while fontsize > 1 and fits(fontsize - 1):
+        fontsize -= 1
+    while not fits(fontsize):
+        fontsize += 1
+    return fontsize
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the total size in bytes of its values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Any, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """Returns the cached value for the key, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Any, value: Any, nbytes: int) -> None:
+        """Caches the value, evicting the least recently used entries that no longer fit."""
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old_nbytes) = self._entries.popitem(last=False)
+                self.current_bytes -= old_nbytes
+
+glyph_atlas = LRUCache(GLYPH_ATLAS_BUDGET)
+gradient_cache = LRUCache(GRADIENT_CACHE_BUDGET)
+render_cache = LRUCache(RENDER_CACHE_BUDGET)
+_renders_in_flight = 0
+_renders_lock = threading.Lock()
+
+def get_glyph(char: str, fontsize: int) -> Tuple[Image.Image, int, int, int]:
+    """Returns the glyph mask with its left and top offsets and right edge, rendering it on a miss."""
+    glyph = glyph_atlas.get((char, fontsize))
+    if glyph is None:
+        font = load_font(fontsize)
+        left, top, right, bottom = font.getbbox(char)
+        mask = Image.new('L', (max(right - left, 0), max(bottom - top, 0)), 0)
+        ImageDraw.Draw(mask).text((-left, -top), char, 255, font=font)
+        glyph = (mask, left, top, right)
+        glyph_atlas.put((char, fontsize), glyph, mask.width * mask.height)
+    return glyph
+
+def get_gradient(color1: Tuple[int, int, int], color2: Tuple[int, int, int], width: int, height: int) -> np.ndarray:
+    """Returns a read-only (height, width, 3) vertical gradient from color1 to color2, cached by its parameters."""
+    key = (tuple(color1), tuple(color2), width, height)
+    gradient = gradient_cache.get(key)
+    if gradient is None:
+        gradient = np.empty((height, width, 3), dtype=np.uint8)
+        gradient[...] = np.linspace(color1, color2, height, dtype=np.uint8)[:, np.newaxis, :]
+        gradient.flags.writeable = False
+        gradient_cache.put(key, gradient, gradient.nbytes)
+    return gradient
+
+def draw_word(txtimg: Image.Image, word: str, fontsize: int, y_offset: int = 0) -> None:
+    """Draws the word's coverage across an 'L' text canvas, spacing its letters evenly.
+
+    y_offset shifts the word vertically, so a canvas holding only a band of rows can be drawn into.
+    """
+    _, _, total_word_width, _ = load_font(fontsize).getbbox(word)
+    gap_width = (txtimg.width - total_word_width) / (len(word) + 1)
+    xpos = gap_width
+    for letter in word:
+        mask, left, top, letter_width = get_glyph(letter, fontsize)
+        x = int(xpos) + left
+        shift = _subpixel_shift(math.modf(xpos)[0])
+        if shift < 0:
+            # The glyph's first column falls outside the mask FreeType renders for this start.
+            mask = mask.crop((1, 0, mask.width, mask.height))
+        else:
+            x += shift
+        y = top + y_offset
+        txtimg.paste(255, (x, y, x + mask.width, y + mask.height), mask)
+        xpos += letter_width + gap_width
+
+def word_rows(word: str, fontsize: int) -> Tuple[int, int]:
+    """Returns the first and one-past-last canvas rows the drawn word can cover."""
+    glyphs = [get_glyph(letter, fontsize) for letter in word]
+    return min(top for _, _, top, _ in glyphs), max(top + mask.height for mask, _, top, _ in glyphs)
+
+def _subpixel_shift(fraction: float) -> int:
+    """Returns how many pixels FreeType moves a glyph drawn at the given fractional start."""
+    # The pen position is rounded half away from zero to 26.6 fixed point, then to whole pixels.
+    pen = np.float32(fraction) * 64
+    pen = math.floor(abs(pen) + 0.5) * (1 if pen >= 0 else -1)
+    return (pen + 32) >> 6
+
+def _sinc(x: float) -> float:
+    if x == 0.0:
+        return 1.0
+    x = x * math.pi
+    return math.sin(x) / x
+
+def _lanczos(x: float) -> float:
+    if -3.0 <= x < 3.0:
+        return _sinc(x) * _sinc(x / 3)
+    return 0.0
+
+@lru_cache(maxsize=128)
+def lanczos_coefficients(in_size: int, out_size: int, first: int, last: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the first input row and fixed-point weights of output rows first..last of a LANCZOS resample.
+
+    This follows Pillow's own coefficient computation step for step, so resampling with these
+    weights matches Image.resize exactly while only touching the rows that are needed.
+    """
+    scale = in_size / out_size
+    filterscale = max(scale, 1.0)
+    support = 3.0 * filterscale
+    ksize = int(math.ceil(support)) * 2 + 1
+    inv_filterscale = 1.0 / filterscale
+    starts = np.zeros(last - first, dtype=np.int64)
+    weights = np.zeros((last - first, ksize), dtype=np.int32)
+    for row, xx in enumerate(range(first, last)):
+        center = (xx + 0.5) * scale
+        xmin = max(int(center - support + 0.5), 0)
+        xmax = min(int(center + support + 0.5), in_size) - xmin
+        kernel = [_lanczos((x + xmin - center + 0.5) * inv_filterscale) for x in range(xmax)]
+        total = 0.0
+        for w in kernel:
+            total += w
+        if total != 0.0:
+            kernel = [w / total for w in kernel]
+        starts[row] = xmin
+        weights[row, :xmax] = [int(-0.5 + w * (1 << 22)) if w < 0 else int(0.5 + w * (1 << 22)) for w in kernel]
+    return starts, weights
+
+def resample_rows(band: np.ndarray, band_top: int, starts: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Vertically resamples a band of 8-bit rows with fixed-point weights, treating rows outside it as empty."""
+    out = np.full((len(starts),) + band.shape[1:], 1 << 21, dtype=np.int32)
+    pixels = band.astype(np.int32)
+    for k in range(weights.shape[1]):
+        rows = starts + k - band_top
+        valid = (rows >= 0) & (rows < len(band)) & (weights[:, k] != 0)
+        if valid.any():
+            out[valid] += weights[valid, k].reshape((-1,) + (1,) * (band.ndim - 1)) * pixels[rows[valid]]
+    return np.clip(out >> 22, 0, 255).astype(np.uint8)
+
+def render_text_mask(word: str, width: int, height: int) -> Image.Image:
+    """Renders the cropped text coverage mask ('L') for an output of the given size.
+
+    Only the band of supersampled rows that is both inked and inside the filter support of the
+    cropped rows is allocated and resampled; the result equals resizing and cropping the full canvas.
+    """
+    text = word.upper()
+    canvas_width, canvas_height = width * 8, height * 8
+    fontsize = fit_font_size(text, canvas_width)
+    (resize_width, resize_height), (_, crop_top, _, crop_bottom) = calculate_text_dimensions(len(word), width)
+    starts, weights = lanczos_coefficients(canvas_height, resize_height, crop_top, crop_bottom)
+
+    ink_top, ink_bottom = word_rows(text, fontsize)
+    band_top = max(ink_top, int(starts[0]), 0)
+    band_bottom = min(ink_bottom, int(starts[-1]) + weights.shape[1], canvas_height)
+    band_height = max(band_bottom - band_top, 1)
+
+    band = Image.new('L', (canvas_width, band_height), 0)
+    draw_word(band, text, fontsize, -band_top)
+    # Horizontal pass with Pillow, then the vertical pass over just the band.
+    band = band.resize((resize_width, band_height), Image.LANCZOS)
+    return Image.fromarray(resample_rows(np.asarray(band), band_top, starts, weights))
+
+def normalize_hex(hex_code: str) -> str:
+    """Returns the hex code in canonical '#RRGGBB' form."""
+    return '#' + ''.join(f'{c:02X}' for c in hex_to_rgb(hex_code))
+
+def parse_size(size: str) -> Tuple[int, int, bool]:
+    """Parses a size such as '512x512', or '512x512 pixel' for pixel-art mode, into (width, height, pixel)."""
     try:
-        width, height = map(int, values['-SIZE-'].split('x'))
+        pixel = size.endswith(PIXEL_ART_SUFFIX)
+        width, height = map(int, size[:-len(PIXEL_ART_SUFFIX)].split('x') if pixel else size.split('x'))
     except (ValueError, AttributeError):
         raise ValueError("Invalid image size selected.")
+    if width <= 0 or height <= 0:
+        raise ValueError("Invalid image size selected.")
+    if pixel:
+        pixel_art_base(width, height)
+    return width, height, pixel
+
+def pixel_art_base(width: int, height: int) -> Tuple[int, int]:
+    """Returns the size a pixel-art render is drawn at before its integer upscale to width x height."""
+    factor = width // PIXEL_ART_BASE
+    # A factor of 1 is the plain render, which would otherwise be cached twice under two keys.
+    if factor < 2 or width % PIXEL_ART_BASE or height % factor:
+        raise ValueError(f"Pixel-art sizes must be a multiple of {PIXEL_ART_BASE} pixels wide, from {PIXEL_ART_BASE * 2}.")
+    return PIXEL_ART_BASE, height // factor
+
+def resolve_values(values: Dict[str, Any]) -> Tuple[str, str, str, int, int, bool]:
+    """Resolves the values into the (word, hex1, hex2, width, height, pixel) that fully describe a render.
+
+    Random choices are drawn from values['-SEED-'] when given, so the same seed always resolves
+    to the same render.
+    """
+    is_user_generated = values.get('-CHECKBOX-', False)
+    rng = random.Random(values.get('-SEED-'))
+
+    width, height, pixel = parse_size(values.get('-SIZE-'))
 
-    
     if is_user_generated:
-        word = values.get('-WORD-', 'PAIN')
+        word = values.get('-WORD-') or 'PAIN'
         if not 2 <= len(word) <= 10:
             raise ValueError("Word must be between 2 and 10 letters.")
     else:
-        wordlist_map = {'Cyberpunk AF': 'SPRAWL', 'TempleOS': 'TempleOS', '1894': '1894'}
         chosen_wordlist = values.get('-WORDLIST-', 'Cyberpunk AF')
-        wordlist_key = wordlist_map.get(chosen_wordlist)
+        wordlist_key = WORDLIST_CHOICES.get(chosen_wordlist)
         if wordlist_key and wordlists.get(wordlist_key):
-            word = random.choice(wordlists[wordlist_key])
+            word = wordlists[wordlist_key].choice(rng)
         else:
             word = "DEFAULT"
 
-    
     hex1 = values.get('-HEX1-')
     hex2 = values.get('-HEX2-')
+    if not (hex1 and hex2 and is_valid_hex_code(hex1) and is_valid_hex_code(hex2)):
+        hex1, hex2 = rng.sample(CRUELTY_SQUAD_PALETTE, 2)
 
-    
-    if hex1 and hex2 and is_valid_hex_code(hex1) and is_valid_hex_code(hex2):
-        color1, color2 = hex_to_rgb(hex1), hex_to_rgb(hex2)
-    else:
-        
-        hex1, hex2 = random.sample(CRUELTY_SQUAD_PALETTE, 2)
-        color1, color2 = hex_to_rgb(hex1), hex_to_rgb(hex2)
+    return word, normalize_hex(hex1), normalize_hex(hex2), width, height, pixel
 
-    
-    text_canvas_size = (width * 8, height * 8)
-    txtimg = Image.new('RGBA', text_canvas_size, (255, 255, 255, 0))
-
-    gradient = np.zeros((height, width, 3), dtype=np.uint8)
-    for i in range(3):
-        gradient[:, :, i] = np.tile(np.linspace(color1[i], color2[i], height, dtype=np.uint8), (width, 1)).T
-    img = Image.fromarray(gradient)
-
-    font_path = os.path.join(c_path, "resources", "Envy Code R.ttf")
-    fontsize = 1
-    font = ImageFont.truetype(font_path, fontsize)
-    while font.getlength(word.upper()) < text_canvas_size[0]:
-        fontsize += 1
-        font = ImageFont.truetype(font_path, fontsize)
+def render_key(word: str, hex1: str, hex2: str, width: int, height: int, pixel: bool = False) -> str:
+    """Returns the content hash identifying the render of these parameters by this renderer version."""
+    canonical = f'{RENDERER_VERSION}|{word}|{normalize_hex(hex1)}|{normalize_hex(hex2)}|{width}x{height}'
+    if pixel:
+        canonical += '|pixel'
+    return hashlib.sha256(canonical.encode('utf8')).hexdigest()
 
-    txtdraw = ImageDraw.Draw(txtimg)
-    _, _, total_word_width, _ = txtdraw.textbbox((0, 0), word.upper(), font=font)
-    gap_width = (text_canvas_size[0] - total_word_width) / (len(word) + 1)
-    xpos = gap_width
-    for letter in word.upper():
-        txtdraw.text((xpos, 0), letter, (0, 0, 0), font=font)
-        _, _, letter_width, _ = txtdraw.textbbox((0, 0), letter, font=font)
-        xpos += letter_width + gap_width
+def render_image(word: str, hex1: str, hex2: str, width: int, height: int, pixel: bool = False) -> Image.Image:
+    """Renders the texture for the given parameters.
 
-    resize_dim, crop_box = calculate_text_dimensions(len(word), width)
-    resized_text = txtimg.resize(resize_dim, Image.LANCZOS)
-    cropped_text = resized_text.crop(crop_box)
+    In pixel-art mode the texture is drawn at the PIXEL_ART_BASE layout and blown up by a whole
+    factor with nearest-neighbour sampling, so a large texture costs about as much as a small one.
+    """
+    if pixel:
+        base_width, base_height = pixel_art_base(width, height)
+        return render_image(word, hex1, hex2, base_width, base_height).resize((width, height), Image.NEAREST)
+    img = Image.fromarray(get_gradient(hex_to_rgb(hex1), hex_to_rgb(hex2), width, height))
+    img.paste((0, 0, 0), (0, 0), render_text_mask(word, width, height))
+    return img
 
-    composite = Image.alpha_composite(img.convert('RGBA'), cropped_text)
+def render_text_masks(words: Sequence[str], width: int, height: int) -> np.ndarray:
+    """Renders the cropped text masks of words of one length as a single (N, rows, width) array.
 
-    
-    savepath = values.get('-FOLDER-', os.path.join(c_path, 'results'))
-    os.makedirs(savepath, exist_ok=True)
+    Words of the same length share their layout, so one band of supersampled rows covers all of
+    them and the vertical resampling pass runs once for the group; each mask equals render_text_mask.
+    """
+    texts = [word.upper() for word in words]
+    canvas_width, canvas_height = width * 8, height * 8
+    (resize_width, resize_height), (_, crop_top, _, crop_bottom) = calculate_text_dimensions(len(texts[0]), width)
+    starts, weights = lanczos_coefficients(canvas_height, resize_height, crop_top, crop_bottom)
+
+    fontsizes = [fit_font_size(text, canvas_width) for text in texts]
+    ink_rows = [word_rows(text, fontsize) for text, fontsize in zip(texts, fontsizes)]
+    band_top = max(min(top for top, _ in ink_rows), int(starts[0]), 0)
+    band_bottom = min(max(bottom for _, bottom in ink_rows), int(starts[-1]) + weights.shape[1], canvas_height)
+    band_height = max(band_bottom - band_top, 1)
+
+    # Rows first, so the vertical pass treats the whole group as one wide band. Each word only
+    # draws and resizes its own inked rows; the rest of its column stays blank.
+    bands = np.zeros((band_height, len(texts), resize_width), dtype=np.uint8)
+    for i, (text, fontsize, (ink_top, ink_bottom)) in enumerate(zip(texts, fontsizes, ink_rows)):
+        top, bottom = max(ink_top, band_top), min(ink_bottom, band_bottom)
+        if bottom <= top:
+            continue
+        band = Image.new('L', (canvas_width, bottom - top), 0)
+        draw_word(band, text, fontsize, -top)
+        bands[top - band_top:bottom - band_top, i] = np.asarray(band.resize((resize_width, bottom - top), Image.LANCZOS))
+    return resample_rows(bands, band_top, starts, weights).transpose(1, 0, 2)
+
+def render_batch(jobs: Sequence[Tuple[str, str, str]], width: int, height: int, pixel: bool = False) -> Iterator[Image.Image]:
+    """Renders (word, hex1, hex2) jobs at one size, yielding the images in order.
+
+    Jobs are processed in chunks of at most BATCH_BUDGET bytes of pixels. Each chunk's gradients
+    are built as one (N, height, width, 3) array, and its text masks are rendered per word length
+    and composited with array operations that match Image.paste exactly, so every image equals
+    render_image for the same job.
+    """
+    if pixel:
+        base_width, base_height = pixel_art_base(width, height)
+        for image in render_batch(jobs, base_width, base_height):
+            yield image.resize((width, height), Image.NEAREST)
+        return
+    chunk_size = max(1, BATCH_BUDGET // (width * height * 3))
+    for chunk_start in range(0, len(jobs), chunk_size):
+        chunk = jobs[chunk_start:chunk_start + chunk_size]
+        # One ramp per colour pair, computed exactly as get_gradient does: a single linspace over
+        # many pairs takes a different SIMD path in numpy and can round a row differently.
+        ramps: Dict[Tuple[str, str], np.ndarray] = {}
+        for _, hex1, hex2 in chunk:
+            if (hex1, hex2) not in ramps:
+                ramps[hex1, hex2] = np.linspace(hex_to_rgb(hex1), hex_to_rgb(hex2), height, dtype=np.uint8)
+        images = np.empty((len(chunk), height, width, 3), dtype=np.uint8)
+        images[...] = np.stack([ramps[hex1, hex2] for _, hex1, hex2 in chunk])[:, :, np.newaxis, :]
+
+        by_length: Dict[int, List[int]] = {}
+        for i, (word, _, _) in enumerate(chunk):
+            by_length.setdefault(len(word), []).append(i)
+        for indices in by_length.values():
+            masks = render_text_masks([chunk[i][0] for i in indices], width, height)
+            rows = masks.shape[1]
+            # Pasting black through an 'L' mask is out = DIV255(in * (255 - mask)) in Pillow.
+            # The largest intermediate is 255 * 255 + 128, so uint16 is wide enough.
+            blended = images[indices, :rows] * (255 - masks[..., np.newaxis].astype(np.uint16)) + 128
+            images[indices, :rows] = ((blended >> 8) + blended) >> 8
+
+        for image in images:
+            yield Image.fromarray(image)
+
+def render_batch_png(jobs: Sequence[Tuple[str, str, str]], width: int, height: int, pixel: bool = False) -> Iterator[bytes]:
+    """Renders (word, hex1, hex2) jobs at one size like render_batch, yielding encoded PNGs."""
+    for image in render_batch(jobs, width, height, pixel):
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        yield buffer.getvalue()
+
+def render_png(word: str, hex1: str, hex2: str, width: int, height: int, pixel: bool = False,
+               disk_cache: bool = True) -> bytes:
+    """Returns the encoded PNG for the parameters, from the memory or disk render cache when possible.
+
+    With disk_cache False the disk tier is neither read nor written, for renders that will not be
+    asked for again.
+    """
+    global _renders_in_flight
+    key = render_key(word, hex1, hex2, width, height, pixel)
+    png = render_cache.get(key)
+    if png is not None:
+        return png
+
+    cache_name = os.path.join(key[:2], f'{key}.png')
+    if disk_cache:
+        try:
+            with open(os.path.join(RENDER_CACHE_FOLDER, cache_name), 'rb') as f:
+                png = f.read()
+            render_cache_store().touch(cache_name)
+        except OSError:
+            png = None
+        except sqlite3.Error as e:
+            print(f"Could not update render cache entry {key}: {e}")
+
+    if png is None:
+        with _renders_lock:
+            _renders_in_flight += 1
+        try:
+            buffer = io.BytesIO()
+            render_image(word, hex1, hex2, width, height, pixel).save(buffer, format='PNG')
+            png = buffer.getvalue()
+        finally:
+            with _renders_lock:
+                _renders_in_flight -= 1
+        if disk_cache:
+            try:
+                render_cache_store().save(cache_name, png)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Could not write render cache entry {key}: {e}")
+
+    render_cache.put(key, png, len(png))
+    return png
+
+def renders_in_flight() -> int:
+    """Returns how many render_png calls in this process are rendering right now, rather than reading a cache."""
+    return _renders_in_flight
+
+def warm_up() -> None:
+    """Loads the font and fits a common size ahead of the first render, e.g. in a new worker process."""
+    fit_font_size('PAIN', 256 * 8)
+
+def preload(sizes: Tuple[int, ...]) -> None:
+    """Loads the wordlists and the fonts, glyphs and resampling tables for each output size ahead of serving.
+
+    Meant for a server's parent process, so that forked workers share them copy-on-write.
+    """
+    for index in wordlists.values():
+        len(index)
+    for size in sizes:
+        render_text_mask('PAIN', size, size)
+
+def is_reproducible(values: Dict[str, Any]) -> bool:
+    """Tells whether the values always resolve to the same render: a seed, or a user word with valid colours."""
+    if values.get('-SEED-') is not None:
+        return True
+    hex1, hex2 = values.get('-HEX1-'), values.get('-HEX2-')
+    return bool(values.get('-CHECKBOX-') and hex1 and hex2 and is_valid_hex_code(hex1) and is_valid_hex_code(hex2))
+
+def generate(values: Dict[str, Any], disk_cache: bool = True) -> Tuple[str, bytes]:
+    """Generates a single image in memory and returns its file name and encoded PNG.
+
+    Only reproducible renders go to the disk render cache, since a random one is never asked for
+    again; callers that save the image themselves can pass disk_cache=False to skip it entirely.
+    """
+    params = resolve_values(values)
+    key = render_key(*params)
+    return f'{params[0].upper()}_{key[:8]}.png', render_png(*params, disk_cache=disk_cache and is_reproducible(values))
+
+class ResultsStore:
+    """A folder of saved images kept within a byte and file-count budget by evicting the least recently used.
+
+    The files it saved are indexed in SQLite inside the folder, so eviction never lists the
+    directory, and writes, evictions and access updates from several processes are serialized
+    by the database's write lock. Files it did not save are never touched.
+    """
+
+    def __init__(self, folder: str, max_bytes: int, max_files: int):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(folder, '.results.db'), timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, size INTEGER, last_access REAL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS files_last_access ON files (last_access)')
+        self._lock = threading.Lock()
+
+    def save(self, filename: str, data: bytes) -> str:
+        """Writes the file, evicts the least recently used files over budget and returns the file's path."""
+        path = os.path.join(self.folder, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+                self.conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?)', (filename, len(data), time.time()))
+                self._evict(filename)
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        return path
+
+    def touch(self, filename: str) -> None:
+        """Records an access to the file, moving it to the back of the eviction order."""
+        with self._lock:
+            self.conn.execute('UPDATE files SET last_access = ? WHERE name = ?', (time.time(), filename))
+
+    def _evict(self, keep: str):
+        count, total = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files').fetchone()
+        if count <= self.max_files and total <= self.max_bytes:
+            return
+        evicted = []
+        for name, size in self.conn.execute('SELECT name, size FROM files WHERE name != ? ORDER BY last_access', (keep,)):
+            if count <= self.max_files and total <= self.max_bytes:
+                break
+            evicted.append(name)
+            count -= 1
+            total -= size
+        self.conn.executemany('DELETE FROM files WHERE name = ?', [(name,) for name in evicted])
+        for name in evicted:
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                pass
+
+@lru_cache(maxsize=None)
+def results_store() -> ResultsStore:
+    """Returns the store that keeps the default results folder within its budget, opening it on first use."""
+    return ResultsStore(RESULTS_FOLDER, RESULTS_BUDGET, RESULTS_MAX_FILES)
+
+def save_result(folder: str, filename: str, data: bytes) -> str:
+    """Saves a generated image to folder and returns its path.
+
+    Only the default results folder is kept within the results budget. A folder the user picked is
+    written to as is, so nothing there is ever indexed or deleted.
+    """
+    if os.path.realpath(folder) == os.path.realpath(RESULTS_FOLDER):
+        return results_store().save(filename, data)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, filename)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+@lru_cache(maxsize=None)
+def render_cache_store() -> ResultsStore:
+    """Returns the store that keeps the disk render cache within its budget, opening it on first use."""
+    return ResultsStore(RENDER_CACHE_FOLDER, RENDER_CACHE_DISK_BUDGET, RENDER_CACHE_DISK_FILES)
+
+def generate_image(values: Dict[str, Any]) -> str:
+    """Generates a single image based on the provided values, saves it and returns the save path."""
+    save_filename, png = generate(values, disk_cache=False)
+    return save_result(values.get('-FOLDER-', RESULTS_FOLDER), save_filename, png)
+
+class WarmPool:
+    """Pre-rendered random images per (wordlist, size), topped up by a background thread while idle.
+
+    render is called with random-mode values to produce (filename, png) pairs and defaults to
+    generate(); is_idle tells the refill thread when it may render, and defaults to no foreground
+    generate() calls running through this pool and no other render_png() rendering in the process,
+    such as an image endpoint or a batch job.
+    """
+
+    def __init__(self, depth: int, max_bytes: int, render: Optional[Callable[[Dict[str, Any]], Tuple[str, bytes]]] = None,
+                 is_idle: Optional[Callable[[], bool]] = None):
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._render = render or generate
+        self._is_idle = is_idle or (lambda: self._active == 0 and renders_in_flight() == 0)
+        self._active = 0
+        self._images: Dict[Tuple[str, str], deque] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def pool_key(values: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """Returns the (wordlist, size) pool serving the values, or None if they are not fully random.
+
+        Only the wordlists and sizes the front ends offer get a pool, so arbitrary form input
+        cannot make the refill thread pre-render for new keys.
+        """
+        if values.get('-CHECKBOX-') or values.get('-SEED-') is not None:
+            return None
+        hex1, hex2 = values.get('-HEX1-'), values.get('-HEX2-')
+        if hex1 and hex2 and is_valid_hex_code(hex1) and is_valid_hex_code(hex2):
+            return None
+        wordlist, size = values.get('-WORDLIST-', 'Cyberpunk AF'), values.get('-SIZE-')
+        if wordlist not in WORDLIST_CHOICES or size not in IMAGE_SIZES:
+            return None
+        return wordlist, size
+
+    def take(self, values: Dict[str, Any]) -> Optional[Tuple[str, bytes]]:
+        """Pops a pre-rendered image for random-mode values, or returns None on a miss."""
+        key = self.pool_key(values)
+        if key is None or self.depth <= 0:
+            return None
+        with self._cond:
+            images = self._images.setdefault(key, deque())
+            if images:
+                filename, png = images.popleft()
+                self.current_bytes -= len(png)
+                self.hits += 1
+                result = (filename, png)
+            else:
+                self.misses += 1
+                result = None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._refill, name='warm-pool', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return result
+
+    def generate(self, values: Dict[str, Any]) -> Tuple[str, bytes]:
+        """Serves random-mode values from the pool, rendering anything else (and misses) directly."""
+        result = self.take(values)
+        if result is not None:
+            return result
+        with self._cond:
+            self._active += 1
+        try:
+            return self._render(values)
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit and miss counts and the number and size of pooled images."""
+        with self._cond:
+            return {'hits': self.hits, 'misses': self.misses, 'images': sum(len(i) for i in self._images.values()),
+                    'bytes': self.current_bytes}
+
+    def _next_key(self) -> Optional[Tuple[str, str]]:
+        if self.current_bytes >= self.max_bytes:
+            return None
+        candidates = [(len(images), key) for key, images in self._images.items() if len(images) < self.depth]
+        return min(candidates)[1] if candidates else None
 
-    random_file_number = f'{random.randint(1, 999):03}'
-    save_filename = f'{word.upper()}_{random_file_number}.png'
-    save_full_path = os.path.join(savepath, save_filename)
-    composite.save(save_full_path, quality=95)
+    def _refill(self):
+        while True:
+            with self._cond:
+                key = self._next_key()
+                while key is None:
+                    self._cond.wait()
+                    key = self._next_key()
+            if not self._is_idle():
+                time.sleep(WARM_POOL_IDLE_POLL)
+                continue
+            try:
+                filename, png = self._render({'-CHECKBOX-': False, '-WORDLIST-': key[0], '-SIZE-': key[1]})
+            except ValueError:
+                with self._cond:
+                    self._images.pop(key, None)
+                continue
+            except Exception as e:
+                print(f"Warm pool render failed: {e}")
+                time.sleep(WARM_POOL_IDLE_POLL)
+                continue
+            with self._cond:
+                self._images.setdefault(key, deque()).append((filename, png))
+                self.current_bytes += len(png)
 
-    return save_full_path
\ No newline at end of file
+warm_pool = WarmPool(WARM_POOL_DEPTH, WARM_POOL_BUDGET)
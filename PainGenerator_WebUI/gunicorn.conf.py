@@ -0,0 +1,11 @@
+import multiprocessing
+import os
+
+bind = os.environ.get('PAIN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('PAIN_WEB_WORKERS', multiprocessing.cpu_count()))
+# Threads let a worker keep answering while it streams a batch ZIP or polls a job.
+worker_class = 'gthread'
+threads = int(os.environ.get('PAIN_WEB_THREADS', 4))
+# Import the app, and preload everything it renders with, once in the parent before forking.
+preload_app = True
+timeout = 120
@@ -0,0 +1,237 @@
+import io
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+import zipfile
+from typing import Dict, Any, Iterator, List, Optional
+import generator
+
+JOB_WORKERS = int(os.environ.get('PAIN_JOB_WORKERS', 2))
+JOB_QUEUE_LENGTH = int(os.environ.get('PAIN_JOB_QUEUE_LENGTH', 8))
+JOB_TTL = 3600
+JOB_FOLDER = os.path.join(generator.RENDER_CACHE_FOLDER, 'jobs')
+JOB_POLL = 0.5
+
+
+class JobQueueFullError(Exception):
+    """Raised when every job slot is taken by a queued or running batch."""
+
+
+class BatchJob:
+    """A batch of random images rendered in the background, one seed per image."""
+
+    def __init__(self, values: Dict[str, Any], count: int):
+        self.id = uuid.uuid4().hex
+        self.values = values
+        # Seeding every image makes the batch reproducible from the job alone.
+        base_seed = random.randrange(2 ** 32)
+        self.seeds = [base_seed + i for i in range(count)]
+        self.status = 'queued'
+        self.done = 0
+        self.error: Optional[str] = None
+        self.filenames: List[str] = []
+        self.finished_at: Optional[float] = None
+        self._progress = threading.Condition()
+        self._state_path: Optional[str] = None
+
+    @property
+    def total(self) -> int:
+        return len(self.seeds)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed')
+
+    def image_values(self, index: int) -> Dict[str, Any]:
+        """Returns the values that render image index of the batch."""
+        return dict(self.values, **{'-SEED-': self.seeds[index]})
+
+    def wait_for(self, index: int) -> bool:
+        """Blocks until image index is rendered, returning False if the batch failed before reaching it."""
+        with self._progress:
+            while not (self.done > index or self.finished):
+                # Jobs run by another process only change on disk, so those are polled.
+                self._progress.wait(JOB_POLL if self._state_path else None)
+                self.refresh()
+            return self.done > index
+
+    def refresh(self):
+        """Reloads the progress of a job run by another process from its state file."""
+        if self._state_path is None:
+            return
+        try:
+            with open(self._state_path, 'r', encoding='utf8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {'status': 'failed', 'error': 'Batch expired.'}
+        for name in ('status', 'done', 'error', 'filenames', 'finished_at'):
+            if name in state:
+                setattr(self, name, state[name])
+
+    def _advance(self, **changes):
+        with self._progress:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            self._progress.notify_all()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'id': self.id, 'status': self.status, 'done': self.done, 'total': self.total,
+                'error': self.error, 'filenames': list(self.filenames)}
+
+    def to_state(self) -> Dict[str, Any]:
+        return dict(self.to_dict(), values=self.values, seeds=self.seeds, finished_at=self.finished_at)
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], state_path: str) -> 'BatchJob':
+        job = cls(state['values'], 0)
+        job.id = state['id']
+        job.seeds = state['seeds']
+        job._state_path = state_path
+        job.refresh()
+        return job
+
+
+class JobQueue:
+    """Runs batch jobs on a fixed number of daemon worker threads and refuses new jobs once max_jobs are pending.
+
+    Job state is also written to folder, so any process serving the WebUI can report on a job
+    or stream its images while the process that accepted it does the rendering.
+    """
+
+    def __init__(self, workers: int, max_jobs: int, folder: str):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.folder = folder
+        self._jobs: Dict[str, BatchJob] = {}
+        self._pending: "queue.Queue[BatchJob]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def submit(self, values: Dict[str, Any], count: int) -> BatchJob:
+        """Queues a batch of count images and returns its job without waiting for it."""
+        with self._lock:
+            self._expire()
+            if sum(not job.finished for job in self._jobs.values()) >= self.max_jobs:
+                raise JobQueueFullError("Too many batches are queued, try again shortly.")
+            job = BatchJob(values, count)
+            self._jobs[job.id] = job
+            self._save(job)
+            # Workers start with the first batch, so importing the WebUI costs no threads.
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f'batch-job-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._pending.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        """Returns the job with the id, whichever process is running it, or None if it is unknown."""
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        state_path = self._state_path(job_id)
+        try:
+            with open(state_path, 'r', encoding='utf8') as f:
+                return BatchJob.from_state(json.load(f), state_path)
+        except (OSError, ValueError):
+            return None
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self.folder, f'{job_id}.json')
+
+    def _save(self, job: BatchJob):
+        state_path = self._state_path(job.id)
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            temp_path = f'{state_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'w', encoding='utf8') as f:
+                json.dump(job.to_state(), f)
+            os.replace(temp_path, state_path)
+        except OSError as e:
+            print(f"Could not save batch {job.id}: {e}")
+
+    def _expire(self):
+        cutoff = time.time() - JOB_TTL
+        for job_id in [job.id for job in self._jobs.values() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+        # Files are swept by age rather than from _jobs, so the jobs of processes that have exited
+        # are cleaned up too. Running jobs save after every image and so always look recent.
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.folder, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _work(self):
+        while True:
+            self._run(self._pending.get())
+
+    def _run(self, job: BatchJob):
+        job._advance(status='running')
+        self._save(job)
+        try:
+            for index in range(job.total):
+                filename, _ = generator.generate(job.image_values(index))
+                job.filenames.append(filename)
+                job._advance(done=job.done + 1)
+                self._save(job)
+            job._advance(status='done', finished_at=time.time())
+        except Exception as e:
+            print(f"Batch {job.id} failed: {e}")
+            job._advance(error=str(e), status='failed', finished_at=time.time())
+        self._save(job)
+
+
+class _ChunkWriter(io.RawIOBase):
+    """An unseekable sink that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(job: BatchJob) -> Iterator[bytes]:
+    """Yields a ZIP of the batch one entry at a time, following the job as it renders.
+
+    Entries are stored rather than deflated since PNGs are already compressed. Each image is
+    fetched back through generate(), which the render cache answers without re-rendering,
+    so only one image is held in memory at a time.
+    """
+    sink = _ChunkWriter()
+    # An unseekable sink makes zipfile write data descriptors instead of seeking back.
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        for index in range(job.total):
+            if not job.wait_for(index):
+                break
+            filename, png = generator.generate(job.image_values(index))
+            archive.writestr(zipfile.ZipInfo(filename, time.localtime()[:6]), png)
+            yield sink.drain()
+    yield sink.drain()
+
+
+job_queue = JobQueue(JOB_WORKERS, JOB_QUEUE_LENGTH, JOB_FOLDER)
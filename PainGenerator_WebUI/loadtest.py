@@ -0,0 +1,81 @@
+"""Local load test for the production server: measures render throughput at several worker counts.
+
+Run from this folder, e.g. `python loadtest.py --workers 1 2 4`. Every request asks for a
+word and colour pair that has not been rendered before, so the numbers measure rendering
+rather than the render cache.
+"""
+import argparse
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+
+def random_render_path(size: int) -> str:
+    word = ''.join(random.choices(string.ascii_uppercase, k=random.randint(2, 10)))
+    hex1, hex2 = (f'{random.randrange(0x1000000):06X}' for _ in range(2))
+    return f'/render/{size}/{word}.png?hex1={hex1}&hex2={hex2}'
+
+def wait_until_up(base_url: str, timeout: float) -> None:
+    deadline = time.time() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(base_url + '/stats', timeout=5).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            if time.time() > deadline:
+                raise RuntimeError(f"Server at {base_url} did not start within {timeout}s.")
+            time.sleep(0.2)
+
+def run_clients(base_url: str, size: int, clients: int, duration: float) -> Tuple[int, int]:
+    """Sends requests from clients concurrent connections for duration seconds, returning (ok, failed)."""
+    deadline = time.time() + duration
+
+    def client() -> Tuple[int, int]:
+        ok = failed = 0
+        while time.time() < deadline:
+            try:
+                urllib.request.urlopen(base_url + random_render_path(size), timeout=60).read()
+                ok += 1
+            except (urllib.error.URLError, ConnectionError):
+                failed += 1
+        return ok, failed
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(lambda _: client(), range(clients)))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--size', type=int, default=256, choices=(128, 256, 512, 1024))
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    with tempfile.TemporaryDirectory() as cache_folder:
+        env = dict(os.environ, PAIN_RENDER_CACHE=cache_folder, PAIN_BIND=f'127.0.0.1:{args.port}')
+        for workers in args.workers:
+            env['PAIN_WEB_WORKERS'] = str(workers)
+            server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                                      env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_up(base_url, 60)
+                ok, failed = run_clients(base_url, args.size, args.clients, args.duration)
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{workers} worker(s): {ok / args.duration:.1f} renders/s ({ok} ok, {failed} failed)")
+
+
+if __name__ == '__main__':
+    main()
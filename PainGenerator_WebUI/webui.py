@@ -1,17 +1,21 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory
+from flask import Flask, Response, render_template, request, redirect, url_for, send_from_directory, jsonify, abort
+import base64
 import os
+import re
 import generator
+import jobs
 
 app = Flask(__name__)
 
 
 c_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-app.config['RESULTS_FOLDER'] = os.path.join(c_path, 'results')
+app.config['RESULTS_FOLDER'] = generator.RESULTS_FOLDER
 app.config['RESOURCES_FOLDER'] = os.path.join(c_path, 'resources')
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     image_path = None
+    job_id = None
     form_data = request.form.to_dict()
 
     if request.method == 'POST':
@@ -36,14 +40,16 @@ def index():
                  except (ValueError, TypeError):
                     raise ValueError("Invalid number of images.")
 
-            
-            for _ in range(times_to_run):
-                saved_image_path = generator.generate_image(values)
-
-            
-            relative_image_path = os.path.relpath(saved_image_path, c_path)
-            image_path = url_for('serve_results', filename=os.path.basename(relative_image_path))
+            if times_to_run > 1:
+                # Batches render in the background, so bad input is caught here rather than by the job.
+                generator.resolve_values(values)
+                job_id = jobs.job_queue.submit(values, times_to_run).id
+            else:
+                _, png = generator.warm_pool.generate(values)
+                image_path = 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
 
+        except jobs.JobQueueFullError as e:
+            abort(503, str(e))
         except ValueError as e:
             
             print(f"Error: {e}")
@@ -73,10 +79,80 @@ def index():
         '#00FF40', '#00FF80', '#00FFBF', '#00FFFF', '#00BFFF', '#0080FF',
         '#0040FF', '#0000FF', '#4000FF', '#8000FF', '#BF00FF', '#FF00FF',
     ]
-    return render_template('index.html', image_path=image_path, form_data=form_data, colors=colors)
+    return render_template('index.html', image_path=image_path, job_id=job_id, form_data=form_data, colors=colors,
+                           wordlists=list(generator.WORDLIST_CHOICES), sizes=generator.IMAGE_SIZES)
+
+@app.route('/render/<int:size>/<word>.png')
+def render(size, word):
+    if size not in generator.RENDER_SIZES:
+        abort(404)
+    # Responses are cached for a year, so a typo must fail rather than fall back to a random value.
+    hex1, hex2 = (request.args.get(name) or None for name in ('hex1', 'hex2'))
+    hex1, hex2 = (value if not value or value.startswith('#') else '#' + value for value in (hex1, hex2))
+    if (hex1 is None) != (hex2 is None):
+        abort(400, "Give both hex1 and hex2, or neither.")
+    for name, value in (('hex1', hex1), ('hex2', hex2)):
+        if value is not None and not generator.is_valid_hex_code(value):
+            abort(400, f"Invalid {name} colour.")
+    seed, pixel = request.args.get('seed', '0'), request.args.get('pixel', '0')
+    if not re.fullmatch(r'-?\d{1,18}', seed):
+        abort(400, "Seed must be an integer of at most 18 digits.")
+    if pixel not in ('0', '1'):
+        abort(400, "Pixel must be 0 or 1.")
+    values = {
+        '-CHECKBOX-': True,
+        '-WORD-': word,
+        '-HEX1-': hex1,
+        '-HEX2-': hex2,
+        '-SIZE-': f'{size}x{size}' + (generator.PIXEL_ART_SUFFIX if pixel == '1' else ''),
+        '-SEED-': int(seed),
+    }
+    try:
+        params = generator.resolve_values(values)
+    except ValueError as e:
+        abort(400, str(e))
+
+    # The key hashes every parameter and the renderer version, so it is a strong ETag.
+    etag = generator.render_key(*params)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(generator.render_png(*params), mimetype='image/png')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.job_queue.get(job_id) or abort(404)
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/latest.png')
+def job_latest(job_id):
+    job = jobs.job_queue.get(job_id) or abort(404)
+    if job.done == 0:
+        abort(404)
+    # Finished images are in the shared render cache, so this does not render again.
+    _, png = generator.generate(job.image_values(job.done - 1))
+    response = Response(png, mimetype='image/png')
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/jobs/<job_id>/images.zip')
+def job_zip(job_id):
+    job = jobs.job_queue.get(job_id) or abort(404)
+    return Response(jobs.stream_zip(job), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename=PAIN_{job.id[:8]}.zip'})
+
+@app.route('/stats')
+def stats():
+    return jsonify(warm_pool=generator.warm_pool.stats())
 
 @app.route('/results/<filename>')
 def serve_results(filename):
+    generator.results_store().touch(filename)
     return send_from_directory(app.config['RESULTS_FOLDER'], filename)
 
 
@@ -0,0 +1,11 @@
+"""WSGI entry point for production servers, e.g. `gunicorn -c gunicorn.conf.py wsgi:app`."""
+import gc
+import os
+import generator
+from webui import app
+
+os.makedirs(app.config['RESULTS_FOLDER'], exist_ok=True)
+generator.preload(generator.RENDER_SIZES)
+# Objects loaded so far live for the whole process; freezing them keeps the collector from
+# touching, and so un-sharing, their pages in every forked worker.
+gc.freeze()
@@ -0,0 +1,23 @@
+"""Compiles the wordlists in resources/ into the length-bucketed indexes the generators load.
+
+Run this after editing a wordlist: `python build_wordlists.py`.
+"""
+import os
+from PainGenerator_WebUI.generator import WORDLIST_NAMES, c_path, compile_wordlist
+
+
+def main():
+    for list_name in WORDLIST_NAMES:
+        source_path = os.path.join(c_path, 'resources', f'{list_name}.txt')
+        index_path = os.path.join(c_path, 'resources', f'{list_name}.idx')
+        with open(source_path, 'r', encoding='utf8') as f:
+            index = compile_wordlist(f.read())
+        temp_path = f'{index_path}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(index)
+        os.replace(temp_path, index_path)
+        print(f"Compiled {source_path} -> {index_path} ({len(index)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,12 @@ block_cipher = None
 
 
 a = Analysis(
-    ['paingenerator.py'],
+    ['PainGenerator.py'],
     pathex=[],
     binaries=[],
     datas=[('resources' , 'resources'), ('results' , 'results')],
-    hiddenimports=[],
+    # generator.py imports these lazily by name, which the analysis cannot follow.
+    hiddenimports=['PIL.Image', 'PIL.ImageDraw', 'PIL.ImageFont', 'numpy'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
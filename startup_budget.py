@@ -0,0 +1,62 @@
+"""Startup benchmark: measures each entry point's import time with `-X importtime` and enforces a budget.
+
+Run `python startup_budget.py`; it exits with status 1 if any entry point is over budget.
+`--scale` multiplies every budget, e.g. for slower CI machines.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+c_path = os.path.dirname(os.path.abspath(__file__))
+
+# name: (working directory, module imported by the entry point, budget in milliseconds)
+ENTRY_POINTS: Dict[str, Tuple[str, str, float]] = {
+    'gui': (c_path, 'PainGenerator', 150),
+    'webui': (os.path.join(c_path, 'PainGenerator_WebUI'), 'webui', 400),
+    'bot': (os.path.join(c_path, 'PainGenerator_Discord'), 'bot', 800),
+}
+
+
+def import_time(cwd: str, module: str) -> float:
+    """Returns the cumulative import time of the module in milliseconds, from a fresh interpreter."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    for line in reversed(result.stderr.splitlines()):
+        match = re.match(r'import time:\s*\d+ \|\s*(\d+) \| (\S+)$', line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1000
+    raise RuntimeError(f"No import time reported for {module}.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('entry_points', nargs='*', metavar='entry_point',
+                        help=f"any of {', '.join(ENTRY_POINTS)} (default: all)")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0)
+    args = parser.parse_args()
+
+    unknown = set(args.entry_points) - set(ENTRY_POINTS)
+    if unknown:
+        parser.error(f"unknown entry points: {', '.join(sorted(unknown))}")
+
+    over_budget = False
+    for name in args.entry_points or ENTRY_POINTS:
+        cwd, module, budget = ENTRY_POINTS[name]
+        budget *= args.scale
+        # The first run also writes bytecode caches, so it is not counted.
+        import_time(cwd, module)
+        elapsed = statistics.median(import_time(cwd, module) for _ in range(args.runs))
+        status = 'ok' if elapsed <= budget else 'OVER BUDGET'
+        over_budget |= elapsed > budget
+        print(f"{name:6} {elapsed:7.1f} ms / {budget:5.0f} ms  {status}")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
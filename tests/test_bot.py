@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PainGenerator_Discord'))
+import bot
+
+
+class FakeChannel:
+    """Records what the bot sends, taking upload_time seconds per message like a real upload."""
+
+    def __init__(self, upload_time: float = 0.0):
+        self.upload_time = upload_time
+        self.messages = []
+
+    async def send(self, content=None, files=None):
+        await asyncio.sleep(self.upload_time)
+        self.messages.append((content, [f.filename for f in files or []]))
+
+
+def fake_render(delays):
+    """Returns a render stand-in that finishes job i after delays[i] seconds."""
+    async def render(values):
+        await asyncio.sleep(delays[values['index']])
+        return f"IMAGE{values['index']}.png", b'png'
+    return render
+
+
+class RenderAndSendTest(unittest.IsolatedAsyncioTestCase):
+
+    async def run_batch(self, delays, channel, coalesce=0.2):
+        jobs = [{'index': i} for i in range(len(delays))]
+        with mock.patch.object(bot, 'render', fake_render(delays)), \
+                mock.patch.object(bot, 'UPLOAD_COALESCE_SECONDS', coalesce):
+            await bot.render_and_send(jobs, channel.send)
+
+    async def test_batch_finishing_together_is_one_message(self):
+        channel = FakeChannel()
+        await self.run_batch([0.01 * i for i in range(10)], channel)
+        self.assertEqual(len(channel.messages), 1)
+        self.assertEqual(len(channel.messages[0][1]), 10)
+
+    async def test_messages_hold_at_most_max_attachments(self):
+        channel = FakeChannel()
+        delays = [0.0] * (bot.MAX_ATTACHMENTS + 3)
+        with mock.patch.object(bot, 'RENDER_QUEUE_DEPTH', 100):
+            await self.run_batch(delays, channel)
+        self.assertEqual([len(files) for _, files in channel.messages], [bot.MAX_ATTACHMENTS, 3])
+
+    async def test_late_images_follow_in_one_more_message(self):
+        channel = FakeChannel(upload_time=0.1)
+        await self.run_batch([0.0] * 5 + [0.5] * 5, channel)
+        self.assertEqual([len(files) for _, files in channel.messages], [5, 5])
+        self.assertEqual(sorted(name for _, files in channel.messages for name in files),
+                         sorted(f'IMAGE{i}.png' for i in range(10)))
+
+    async def test_failed_renders_are_reported_once(self):
+        channel = FakeChannel()
+
+        async def render(values):
+            if values['index'] % 2:
+                raise ValueError("boom")
+            return f"IMAGE{values['index']}.png", b'png'
+
+        with mock.patch.object(bot, 'render', render):
+            await bot.render_and_send([{'index': i} for i in range(4)], channel.send)
+        self.assertEqual([len(files) for _, files in channel.messages], [2, 0])
+        self.assertEqual(channel.messages[1][0], "Failed to generate 2 of 4 images: boom")
+
+
+if __name__ == '__main__':
+    unittest.main()
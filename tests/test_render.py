@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from PainGenerator_WebUI import generator
+
+WORDS = ['AB', 'PAIN', 'Hello', 'wow', 'SPRAWLING', 'ABCDEFGHIJ']
+SIZES = [128, 256]
+
+
+def reference_text(word: str, width: int, height: int) -> Image.Image:
+    """Draws the word on the full 8x canvas and resizes it in one go, as the renderer originally did."""
+    word = word.upper()
+    canvas_width = width * 8
+    text = Image.new('RGBA', (canvas_width, height * 8), (255, 255, 255, 0))
+    fontsize = 1
+    font = ImageFont.truetype(generator.FONT_PATH, fontsize)
+    while font.getlength(word) < canvas_width:
+        fontsize += 1
+        font = ImageFont.truetype(generator.FONT_PATH, fontsize)
+    draw = ImageDraw.Draw(text)
+    _, _, total_word_width, _ = draw.textbbox((0, 0), word, font=font)
+    gap_width = (canvas_width - total_word_width) / (len(word) + 1)
+    xpos = gap_width
+    for letter in word:
+        draw.text((xpos, 0), letter, (0, 0, 0), font=font)
+        _, _, letter_width, _ = draw.textbbox((0, 0), letter, font=font)
+        xpos += letter_width + gap_width
+    resize_dim, crop_box = generator.calculate_text_dimensions(len(word), width)
+    return text.resize(resize_dim, Image.LANCZOS).crop(crop_box)
+
+def reference_image(word: str, hex1: str, hex2: str, width: int, height: int) -> np.ndarray:
+    color1, color2 = generator.hex_to_rgb(hex1), generator.hex_to_rgb(hex2)
+    gradient = np.zeros((height, width, 3), dtype=np.uint8)
+    for i in range(3):
+        gradient[:, :, i] = np.tile(np.linspace(color1[i], color2[i], height, dtype=np.uint8), (width, 1)).T
+    image = Image.alpha_composite(Image.fromarray(gradient).convert('RGBA'), reference_text(word, width, height))
+    return np.asarray(image.convert('RGB'))
+
+
+class PixelIdentityTest(unittest.TestCase):
+    """The renderer reproduces Pillow's LANCZOS and FreeType's pen rounding; these catch a Pillow upgrade that changes either."""
+
+    def test_text_mask_matches_full_canvas_resize(self):
+        for size in SIZES:
+            for word in WORDS:
+                with self.subTest(word=word, size=size):
+                    expected = np.asarray(reference_text(word, size, size).getchannel('A'))
+                    actual = np.asarray(generator.render_text_mask(word, size, size))
+                    np.testing.assert_array_equal(actual, expected)
+
+    def test_render_batch_matches_reference(self):
+        colours = [('#FF0000', '#0000FF'), ('#5E5441', '#E5394A'), ('#FF0000', '#0000FF'), ('#000000', '#FFFFFF')]
+        for size in SIZES:
+            jobs = [(word, *colours[i % len(colours)]) for i, word in enumerate(WORDS + ['PAIN', 'OK'])]
+            images = list(generator.render_batch(jobs, size, size))
+            self.assertEqual(len(images), len(jobs))
+            for (word, hex1, hex2), image in zip(jobs, images):
+                with self.subTest(word=word, size=size):
+                    np.testing.assert_array_equal(np.asarray(image), reference_image(word, hex1, hex2, size, size))
+
+    def test_render_image_matches_reference(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                np.testing.assert_array_equal(np.asarray(generator.render_image('Hello', '#81C75F', '#58181F', size, size)),
+                                              reference_image('Hello', '#81C75F', '#58181F', size, size))
+
+
+if __name__ == '__main__':
+    unittest.main()